@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 
 import argparse
-import bisect
-import copy
+import contextlib
+import csv
 import dataclasses
+import enum
+import functools
+import hashlib
+import itertools
+import json
 import math
-from typing import Iterator, Self
+import os
+import sys
+import tempfile
+from multiprocessing import Pool
+from typing import Any, Callable, Iterable, Iterator, Self
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -128,6 +137,8 @@ FLEET_MODULE_SHARD_DROP_TABLE = [
     (4000, 21), (4250, 22), (4500, 23), (4750, 24),
     (5000, 25),
 ]
+FLEET_MODULE_SHARD_DROP_WAVES = [wave for wave, _ in FLEET_MODULE_SHARD_DROP_TABLE]
+FLEET_MODULE_SHARD_DROP_VALUES = [shards for _, shards in FLEET_MODULE_SHARD_DROP_TABLE]
 
 FLEET_REROLL_SHARD_DROP_CHANCE = 0.8
 FLEET_MODULE_SHARD_DROP_CHANCE = 0.2
@@ -283,9 +294,60 @@ MASTERY_STONE_COSTS = {
 REWARD_NAMES = ["coins", "cells", "rerolls", "modules"]
 # fmt: on
 
+# Snapshot of all game data above, used to invalidate cached results when it changes.
+GAME_DATA = {name: value for name, value in globals().items() if name.isupper()}
+
+# Result cache
+
+# Bump whenever the layout of cached results changes. Changes to the simulation logic
+# invalidate cached results on their own, see `code_hash`.
+RESULT_CACHE_VERSION = 2
+RESULT_CACHE_MAX_BYTES = 1 << 30
+# Simulation fields that do not affect the simulated run (only how it is reported).
+RESULT_CACHE_IGNORED_FIELDS = [
+    "name",
+    "mastery",
+    "level",
+    "skip",
+    "reward",
+    "sum_total_stone_cost",
+]
+
 
 # Data types
 
+# Enemies, free upgrades, enemy level skips and perks are stored in fixed-layout arrays
+# indexed by these enums.
+Enemy = enum.IntEnum("Enemy", list(COIN_DROP_TABLE.keys()), start=0)
+FreeUpgrade = enum.IntEnum("FreeUpgrade", ["attack", "defense", "utility"], start=0)
+EnemyLevelSkip = enum.IntEnum("EnemyLevelSkip", ["attack", "health"], start=0)
+Perk = enum.IntEnum("Perk", list(ALL_PERKS.keys()), start=0)
+
+
+def perk_mask(names: Iterable[str]) -> np.ndarray:
+    mask = np.zeros(len(Perk), dtype=bool)
+    mask[[Perk[name] for name in names]] = True
+    return mask
+
+
+PERK_QUANTITIES = np.array([ALL_PERKS[perk.name] for perk in Perk])
+# Perk confidences are stored in a perks x quantity matrix. Perks with a lower quantity
+# than the maximum leave the remaining entries of their row unused (always 0).
+PERK_QUANTITY_MASK = np.arange(PERK_QUANTITIES.max()) < PERK_QUANTITIES[:, np.newaxis]
+PERK_CATEGORIES = [
+    (perk_mask(STANDARD_PERKS.keys()), STANDARD_PERK_CHANCE),
+    (perk_mask(ULTIMATE_PERKS.keys()), ULTIMATE_PERK_CHANCE),
+    (perk_mask(TRADEOFF_PERKS.keys()), TRADEOFF_PERK_CHANCE),
+]
+
+COIN_DROPS = np.array([COIN_DROP_TABLE[enemy.name] for enemy in Enemy])
+SPAWN_CHANCE_ENEMIES = [Enemy[name] for name in SPAWN_CHANCE_TABLE.keys()]
+SPAWN_CHANCES = np.array(list(SPAWN_CHANCE_TABLE.values()))
+ELITE_ENEMIES = [Enemy.scatter, Enemy.vampire, Enemy.ray]
+FLEET_ENEMIES = [Enemy.saboteur, Enemy.commander, Enemy.overcharge]
+# Each fleet enemy spawns children of one common enemy type.
+FLEET_CHILD_ENEMIES = [Enemy.fast, Enemy.tank, Enemy.ranged]
+
 
 @dataclasses.dataclass
 class Simulation:
@@ -300,6 +362,8 @@ class Simulation:
     orb_hits: float = 1.0
     reward: str = "coins"
     sum_total_stone_cost: bool = False
+    # Which waves are kept in the run results, see `sampled_waves`.
+    sample: str = "all"
     bhd_bonus: float = 0
     golden_combo: float = 0
 
@@ -365,98 +429,134 @@ class Simulation:
         return base - self.perk_waves_required_lab
 
 
-def perks_default_factory() -> dict[str, float]:
-    return {
-        name: 0.0 for name in ALL_PERKS.keys()
-    }
+def perks_default_factory() -> np.ndarray:
+    return np.zeros(len(Perk))
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Perks:
-    perks: dict[str, float] = dataclasses.field(default_factory=perks_default_factory)
+    # Quantity of each perk, indexed by `Perk`.
+    perks: np.ndarray = dataclasses.field(default_factory=perks_default_factory)
 
     def pwr_bonus(self, sim: Simulation) -> float:
-        return 1.0 + self.perks.get("std-pwr", 0) * PERK_BONUSES["std-pwr"] * sim.standard_perk_bonus()
+        return 1.0 + self.perks[Perk["std-pwr"]] * PERK_BONUSES["std-pwr"] * sim.standard_perk_bonus()
 
     def game_speed_factor(self, sim: Simulation) -> float:
-        return (GAME_SPEED + self.perks.get("std-game-speed", 0) * PERK_BONUSES["std-game-speed"] * sim.standard_perk_bonus()) / GAME_SPEED
+        return (GAME_SPEED + self.perks[Perk["std-game-speed"]] * PERK_BONUSES["std-game-speed"] * sim.standard_perk_bonus()) / GAME_SPEED
 
     def coin_bonus(self, sim: Simulation) -> float:
         bonus = 1.0
-        bonus *= self.perks.get("std-coin-bonus", 0) * PERK_BONUSES["std-coin-bonus"] * sim.standard_perk_bonus()
-        bonus *= self.perks.get("uw-gt", 0) * PERK_BONUSES["uw-gt"]
-        bonus *= self.perks.get("to-coin", 0) * PERK_BONUSES["to-coin"] * sim.tradeoff_perk_bonus()
+        bonus *= self.perks[Perk["std-coin-bonus"]] * PERK_BONUSES["std-coin-bonus"] * sim.standard_perk_bonus()
+        bonus *= self.perks[Perk["uw-gt"]] * PERK_BONUSES["uw-gt"]
+        bonus *= self.perks[Perk["to-coin"]] * PERK_BONUSES["to-coin"] * sim.tradeoff_perk_bonus()
         return 1.0 + bonus
 
     def free_upgrade_chance_bonus(self, sim: Simulation) -> float:
-        return self.perks.get("std-freeup-chance", 0) * PERK_BONUSES["std-freeup-chance"] * sim.standard_perk_bonus()
+        return self.perks[Perk["std-freeup-chance"]] * PERK_BONUSES["std-freeup-chance"] * sim.standard_perk_bonus()
+
+    def bonuses(self, sim: Simulation) -> "PerkBonuses":
+        return PerkBonuses(
+            pwr_bonus=self.pwr_bonus(sim),
+            game_speed_factor=self.game_speed_factor(sim),
+            coin_bonus=self.coin_bonus(sim),
+            free_upgrade_chance_bonus=self.free_upgrade_chance_bonus(sim),
+        )
 
 
-def free_upgrades_default_factory() -> dict[str, float]:
-    return {
-        "attack": 0.0,
-        "defense": 0.0,
-        "utility": 0.0,
-    }
+@dataclasses.dataclass(slots=True)
+class PerkBonuses:
+    """
+    Bonuses provided by the active perks. Each field is either a single value or an
+    array of values indexed by wave (see `perk_bonus_table`).
+    """
 
+    pwr_bonus: float | np.ndarray = 1.0
+    game_speed_factor: float | np.ndarray = 1.0
+    coin_bonus: float | np.ndarray = 1.0
+    free_upgrade_chance_bonus: float | np.ndarray = 0.0
+
+    def at(self, wave: int | np.ndarray) -> Self:
+        return PerkBonuses(
+            pwr_bonus=self.pwr_bonus[wave],
+            game_speed_factor=self.game_speed_factor[wave],
+            coin_bonus=self.coin_bonus[wave],
+            free_upgrade_chance_bonus=self.free_upgrade_chance_bonus[wave],
+        )
 
-def enemy_level_skip_default_factory() -> dict[str, float]:
-    return {
-        "attack": 0.0,
-        "health": 0.0,
-    }
 
+def free_upgrades_default_factory() -> np.ndarray:
+    return np.zeros(len(FreeUpgrade))
 
-def enemies_default_factory() -> dict[str, float]:
-    return {name: 0.0 for name in COIN_DROP_TABLE.keys()}
 
+def enemy_level_skip_default_factory() -> np.ndarray:
+    return np.zeros(len(EnemyLevelSkip))
 
-@dataclasses.dataclass
+
+def enemies_default_factory() -> np.ndarray:
+    return np.zeros(len(Enemy))
+
+
+@dataclasses.dataclass(slots=True)
 class Events:
     wave: int = 0
     wave_skip: float = 0.0
-    free_upgrades: dict[str, float] = dataclasses.field(
+    # Indexed by `FreeUpgrade`.
+    free_upgrades: np.ndarray = dataclasses.field(
         default_factory=free_upgrades_default_factory
     )
     recovery_packages: float = 0.0
-    enemy_level_skips: dict[str, float] = dataclasses.field(
+    # Indexed by `EnemyLevelSkip`.
+    enemy_level_skips: np.ndarray = dataclasses.field(
         default_factory=enemy_level_skip_default_factory
     )
-    enemies: dict[str, float] = dataclasses.field(
+    # Indexed by `Enemy`.
+    enemies: np.ndarray = dataclasses.field(
         default_factory=enemies_default_factory
     )
 
     def elite_enemy_count(self) -> float:
-        return self.enemies["scatter"] + self.enemies["vampire"] + self.enemies["ray"]
+        return self.enemies[ELITE_ENEMIES].sum(axis=0)
 
     def fleet_enemy_count(self) -> float:
-        return self.enemies["saboteur"] + self.enemies["commander"] + self.enemies["overcharge"]
+        return self.enemies[FLEET_ENEMIES].sum(axis=0)
 
     def scatter_children_count(self) -> float:
         # Each scatter splits in half 4 times.
-        return self.enemies["scatter"] * sum(1 << i for i in range(1, 5))
+        return self.enemies[Enemy.scatter] * sum(1 << i for i in range(1, 5))
 
     def total_enemy_count(self) -> float:
-        return sum(self.enemies.values()) + self.scatter_children_count()
+        return self.enemies.sum(axis=0) + self.scatter_children_count()
+
+    def copy(self) -> Self:
+        return Events(
+            wave=self.wave,
+            wave_skip=self.wave_skip,
+            free_upgrades=self.free_upgrades.copy(),
+            recovery_packages=self.recovery_packages,
+            enemy_level_skips=self.enemy_level_skips.copy(),
+            enemies=self.enemies.copy(),
+        )
 
     def __iadd__(self, other: Self) -> Self:
         self.wave_skip += other.wave_skip
-        for key, value in other.free_upgrades.items():
-            self.free_upgrades[key] += value
+        self.free_upgrades += other.free_upgrades
         self.recovery_packages += other.recovery_packages
-        for key, value in other.enemy_level_skips.items():
-            self.enemy_level_skips[key] += value
-        for key, value in other.enemies.items():
-            self.enemies[key] += value
+        self.enemy_level_skips += other.enemy_level_skips
+        self.enemies += other.enemies
         return self
 
     def __add__(self, other: Self) -> Self:
-        result = copy.deepcopy(self)
-        result += other
-        return result
+        return Events(
+            wave=self.wave,
+            wave_skip=self.wave_skip + other.wave_skip,
+            free_upgrades=self.free_upgrades + other.free_upgrades,
+            recovery_packages=self.recovery_packages + other.recovery_packages,
+            enemy_level_skips=self.enemy_level_skips + other.enemy_level_skips,
+            enemies=self.enemies + other.enemies,
+        )
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Rewards:
     coins: float = 0.0
     elite_cells: float = 0.0
@@ -471,9 +571,12 @@ class Rewards:
         return self
 
     def __add__(self, other: Self) -> Self:
-        result = copy.deepcopy(self)
-        result += other
-        return result
+        return Rewards(
+            coins=self.coins + other.coins,
+            elite_cells=self.elite_cells + other.elite_cells,
+            reroll_shards=self.reroll_shards + other.reroll_shards,
+            module_shards=self.module_shards + other.module_shards,
+        )
 
     def __isub__(self, other: Self) -> Self:
         self.coins -= other.coins
@@ -483,9 +586,12 @@ class Rewards:
         return self
 
     def __sub__(self, other: Self) -> Self:
-        result = copy.deepcopy(self)
-        result -= other
-        return result
+        return Rewards(
+            coins=self.coins - other.coins,
+            elite_cells=self.elite_cells - other.elite_cells,
+            reroll_shards=self.reroll_shards - other.reroll_shards,
+            module_shards=self.module_shards - other.module_shards,
+        )
 
     def __imul__(self, factor: float | int) -> Self:
         self.coins *= factor
@@ -495,9 +601,12 @@ class Rewards:
         return self
 
     def __mul__(self, factor: float | int) -> Self:
-        result = copy.deepcopy(self)
-        result *= factor
-        return result
+        return Rewards(
+            coins=self.coins * factor,
+            elite_cells=self.elite_cells * factor,
+            reroll_shards=self.reroll_shards * factor,
+            module_shards=self.module_shards * factor,
+        )
 
 
 @dataclasses.dataclass
@@ -508,13 +617,169 @@ class SimulationWaveResult:
     cumulative_rewards: Rewards
 
 
+def map_events(events: Events, fn: Callable[[Any], Any]) -> Events:
+    return Events(
+        wave=events.wave,
+        wave_skip=fn(events.wave_skip),
+        free_upgrades=fn(events.free_upgrades),
+        recovery_packages=fn(events.recovery_packages),
+        enemy_level_skips=fn(events.enemy_level_skips),
+        enemies=fn(events.enemies),
+    )
+
+
+def map_rewards(rewards: Rewards, fn: Callable[[Any], Any]) -> Rewards:
+    return Rewards(
+        coins=fn(rewards.coins),
+        elite_cells=fn(rewards.elite_cells),
+        reroll_shards=fn(rewards.reroll_shards),
+        module_shards=fn(rewards.module_shards),
+    )
+
+
 @dataclasses.dataclass
 class SimulationRunResult:
-    wave_results: list[SimulationWaveResult]
+    """
+    Cumulative results of every wave in a run, stored as one array per field: `wave`
+    and `elapsed_time` are arrays, and every field of `cumulative_events` and
+    `cumulative_rewards` is an array with the waves along its last axis (so
+    `cumulative_events.enemies` has one row per `Enemy`).
+    Use `wave_results` for row-style access.
+    """
+
+    wave: np.ndarray
+    elapsed_time: np.ndarray
+    cumulative_events: Events
+    cumulative_rewards: Rewards
     total: float | None = None
     relative: float | None = None
     roi: float | None = None
 
+    @property
+    def wave_results(self) -> "SimulationWaveResults":
+        return SimulationWaveResults(self)
+
+    def rows(self, index: slice | np.ndarray) -> Self:
+        return dataclasses.replace(
+            self,
+            wave=self.wave[index],
+            elapsed_time=self.elapsed_time[index],
+            cumulative_events=map_events(self.cumulative_events, lambda column: column[..., index]),
+            cumulative_rewards=map_rewards(self.cumulative_rewards, lambda column: column[..., index]),
+        )
+
+
+class SimulationWaveResults:
+    """Read-only view of a `SimulationRunResult` as a sequence of wave results."""
+
+    def __init__(self, run_result: SimulationRunResult):
+        self.run_result = run_result
+
+    def __len__(self) -> int:
+        return len(self.run_result.wave)
+
+    def __getitem__(self, index: int) -> SimulationWaveResult:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return SimulationWaveResult(
+            wave=int(self.run_result.wave[index]),
+            elapsed_time=float(self.run_result.elapsed_time[index]),
+            cumulative_events=map_events(
+                self.run_result.cumulative_events, lambda column: column[..., index]
+            ),
+            cumulative_rewards=map_rewards(
+                self.run_result.cumulative_rewards, lambda column: column[..., index]
+            ),
+        )
+
+    def __iter__(self) -> Iterator[SimulationWaveResult]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+def stack_wave_results(wave_results: Iterable[SimulationWaveResult]) -> SimulationRunResult:
+    # Only keep plain floats for each wave, so that the per-wave `Events` and `Rewards`
+    # can be released while the run is still being simulated.
+    rows = []
+    for wave_result in wave_results:
+        events = wave_result.cumulative_events
+        rewards = wave_result.cumulative_rewards
+        rows.append(
+            (
+                wave_result.wave,
+                wave_result.elapsed_time,
+                events.wave_skip,
+                *events.free_upgrades,
+                events.recovery_packages,
+                *events.enemy_level_skips,
+                *events.enemies,
+                rewards.coins,
+                rewards.elite_cells,
+                rewards.reroll_shards,
+                rewards.module_shards,
+            )
+        )
+    sizes = [1, 1, 1, len(FreeUpgrade), 1, len(EnemyLevelSkip), len(Enemy), 1, 1, 1, 1]
+    (
+        wave,
+        elapsed_time,
+        wave_skip,
+        free_upgrades,
+        recovery_packages,
+        enemy_level_skips,
+        enemies,
+        coins,
+        elite_cells,
+        reroll_shards,
+        module_shards,
+    ) = np.split(np.array(rows, dtype=float).T, np.cumsum(sizes)[:-1])
+    return SimulationRunResult(
+        wave=wave[0].astype(int),
+        elapsed_time=elapsed_time[0],
+        cumulative_events=Events(
+            wave_skip=wave_skip[0],
+            free_upgrades=free_upgrades,
+            recovery_packages=recovery_packages[0],
+            enemy_level_skips=enemy_level_skips,
+            enemies=enemies,
+        ),
+        cumulative_rewards=Rewards(
+            coins=coins[0],
+            elite_cells=elite_cells[0],
+            reroll_shards=reroll_shards[0],
+            module_shards=module_shards[0],
+        ),
+    )
+
+
+def concatenate_run_results(*run_results: SimulationRunResult) -> SimulationRunResult:
+    def concatenate(columns: Iterable[np.ndarray]) -> np.ndarray:
+        return np.concatenate(list(columns), axis=-1)
+
+    return SimulationRunResult(
+        wave=concatenate(run_result.wave for run_result in run_results),
+        elapsed_time=concatenate(run_result.elapsed_time for run_result in run_results),
+        cumulative_events=Events(
+            **{
+                field.name: concatenate(
+                    getattr(run_result.cumulative_events, field.name)
+                    for run_result in run_results
+                )
+                for field in dataclasses.fields(Events)
+                if field.name != "wave"
+            }
+        ),
+        cumulative_rewards=Rewards(
+            **{
+                field.name: concatenate(
+                    getattr(run_result.cumulative_rewards, field.name)
+                    for run_result in run_results
+                )
+                for field in dataclasses.fields(Rewards)
+            }
+        ),
+    )
+
 
 @dataclasses.dataclass
 class PlotLine:
@@ -539,11 +804,134 @@ class Plot:
 # Argument handling
 
 
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "tower-mastery-calc")
+
+
 def tier_and_wave_arg(arg: str) -> tuple[int, int]:
     tier, _, wave = arg.partition(":")
     return int(tier), int(wave)
 
 
+def rewards_arg(arg: str) -> list[str]:
+    if arg == "all":
+        return REWARD_NAMES
+    rewards = arg.split(",")
+    for reward in rewards:
+        if reward not in REWARD_NAMES:
+            raise argparse.ArgumentTypeError(
+                f"invalid reward: {reward!r} (choose from {', '.join(REWARD_NAMES)} or all)"
+            )
+    return rewards
+
+
+def sample_arg(arg: str) -> str:
+    if arg in ("all", "interesting"):
+        return arg
+    policy, _, count = arg.partition(":")
+    if policy not in ("every", "log", "stream") or not count.isdigit() or int(count) < 1:
+        raise argparse.ArgumentTypeError(
+            f"invalid sample policy: {arg!r} "
+            "(choose from all, interesting, every:N, log:N or stream:N)"
+        )
+    return arg
+
+
+BHD_CHOICES = [0, 3, 5, 7, 10]
+# Options that `sweep` can vary: (argument name, type, choices) by axis name. Other
+# options keep a single value for every config of the sweep.
+SWEEP_AXES = {
+    "wave": ("wave", int, None),
+    "tier": ("tier", int, TIERS),
+    "orb-hits": ("orb_hits", float, None),
+    "package-chance": ("package_chance", int, None),
+    "bhd": ("bhd", int, BHD_CHOICES),
+    "golden-combo": ("golden_combo", float, None),
+    **{
+        mastery: (mastery.replace("-", "_"), str, MASTERY_LEVEL_NAMES)
+        for mastery in MASTERY_DISPLAY_NAMES.keys()
+    },
+}
+# Inclusive bounds of sweep axes, matching the checks on their options.
+SWEEP_AXIS_BOUNDS = {
+    "orb-hits": (0.0, 1.0),
+}
+# Options that only change how runs are normalized or plotted, which `sweep` ignores.
+SWEEP_UNSUPPORTED_OPTIONS = {
+    "difference": "--difference",
+    "elapsed": "--elapsed",
+    "relative": "--relative",
+    "roi": "--roi",
+    "sum_total_stone_cost": "--sum-total-stone-cost",
+    "resample": "--resample",
+    "truncate": "--truncate",
+    "crop": "--crop",
+}
+
+
+def sweep_axis_values(name: str, values: Iterable[Any]) -> list[Any]:
+    """
+    Converts the values of a sweep axis to its type, in order and without duplicates.
+    String values may be integer ranges like `11..14` (inclusive).
+    """
+    if name not in SWEEP_AXES:
+        raise argparse.ArgumentTypeError(
+            f"invalid sweep axis: {name!r} (choose from {', '.join(SWEEP_AXES)})"
+        )
+    _, type_, choices = SWEEP_AXES[name]
+
+    converted = []
+    for value in values:
+        first, dots, last = str(value).partition("..")
+        try:
+            if dots:
+                expanded = [type_(str(x)) for x in range(int(first), int(last) + 1)]
+                if not expanded:
+                    raise argparse.ArgumentTypeError(f"empty {name} range: {value!r}")
+                converted += expanded
+            else:
+                converted.append(type_(str(value)))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid {name} value: {value!r}")
+    if not converted:
+        raise argparse.ArgumentTypeError(f"no {name} values")
+    for value in converted:
+        if choices is not None and value not in choices:
+            raise argparse.ArgumentTypeError(
+                f"invalid {name} value: {value!r} (choose from {', '.join(map(str, choices))})"
+            )
+        if name in SWEEP_AXIS_BOUNDS:
+            low, high = SWEEP_AXIS_BOUNDS[name]
+            if not low <= value <= high:
+                raise argparse.ArgumentTypeError(
+                    f"invalid {name} value: {value!r} (must be between {low} and {high})"
+                )
+    return list(dict.fromkeys(converted))
+
+
+def sweep_axis_arg(arg: str) -> tuple[str, list[Any]]:
+    name, sep, values = arg.partition("=")
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"invalid sweep axis: {arg!r} (expected NAME=VALUE,...)")
+    return name, sweep_axis_values(name, values.split(","))
+
+
+def read_sweep_spec(path: str) -> dict[str, list[Any]]:
+    """
+    Reads sweep axes from a JSON object of axis names to a value or a list of values,
+    e.g. `{"tier": "11..14", "bhd": [0, 3, 5, 7, 10], "wave": 4000}`.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if not isinstance(spec, dict):
+        raise argparse.ArgumentTypeError("expected a JSON object of sweep axes")
+    return {
+        name: sweep_axis_values(name, values if isinstance(values, list) else [values])
+        for name, values in spec.items()
+    }
+
+
 def add_common_args(parser: argparse.ArgumentParser):
     # Simulation events
     parser.add_argument(
@@ -574,7 +962,7 @@ def add_common_args(parser: argparse.ArgumentParser):
     )
     parser.add_argument(
         "--bhd",
-        choices=[0, 3, 5, 7, 10],
+        choices=BHD_CHOICES,
         type=int,
         default=0,
         help="BHD free-upgrade coin multiplier (%%)",
@@ -589,10 +977,13 @@ def add_common_args(parser: argparse.ArgumentParser):
     # Reward normalization
     parser.add_argument(
         "--reward",
-        type=str,
-        default="coins",
-        choices=REWARD_NAMES,
-        help="Which reward to plot and compare",
+        type=rewards_arg,
+        action="extend",
+        default=None,
+        help=(
+            "Which rewards to plot and compare (repeat or separate with commas, or "
+            "'all'); one plot is made per reward"
+        ),
     )
     parser.add_argument(
         "--difference",
@@ -626,7 +1017,54 @@ def add_common_args(parser: argparse.ArgumentParser):
         help="Consider the stone cost of all masteries when normalizing results",
     )
 
+    # Simulation engine
+    parser.add_argument(
+        "--engine",
+        choices=["loop", "vector"],
+        default="loop",
+        help="Simulate wave-by-wave (loop) or whole runs at once (vector)",
+    )
+    parser.add_argument(
+        "--sample",
+        type=sample_arg,
+        default="all",
+        metavar="POLICY",
+        help="Waves to keep in the results: all, interesting, every:N, log:N or stream:N",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of simulations to run in parallel (0 for one per CPU)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=default_cache_dir(),
+        help="Directory of cached simulation results",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_false",
+        default=True,
+        dest="cache",
+        help="Do not read or write cached simulation results",
+    )
+
     # Output options
+    parser.add_argument(
+        "--resample",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Resample all runs onto a common time grid with this step",
+    )
+    parser.add_argument(
+        "--resample-to",
+        choices=["shortest", "longest"],
+        default="longest",
+        help="Extend the --resample time grid to the end of the shortest or longest run",
+    )
     parser.add_argument(
         "--truncate",
         action="store_true",
@@ -814,10 +1252,9 @@ def max_intro_wave(sim: Simulation) -> int:
 
 def perk_count_at_wave(
     sim: Simulation,
-    perks: Perks,
+    pwr_bonus: float,
     wave: int,
 ) -> float:
-    pwr_bonus = perks.pwr_bonus(sim)
     pwr_waves = [
         (20, sim.perk_waves_required(200) * pwr_bonus),
         (20, sim.perk_waves_required(250) * pwr_bonus),
@@ -834,14 +1271,11 @@ def perk_count_at_wave(
     return perk_count
 
 
-def perks_confidence_default_factory() -> dict[str, list[float]]:
-    return {
-        perk: [0.0] * qty
-        for perk, qty in ALL_PERKS.items()
-    }
+def perks_confidence_default_factory() -> np.ndarray:
+    return np.zeros(PERK_QUANTITY_MASK.shape)
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class PerksConfidence:
     """
     Confidence that each perk has been selected a given number of times.
@@ -850,134 +1284,133 @@ class PerksConfidence:
 
     count: int = 0
 
-    # For each perk, the confidence that it has been selected 1..n times.
-    # n is the maximum quantity of the perk.
-    perks: dict[str, list[float]] = dataclasses.field(default_factory=perks_confidence_default_factory)
+    # For each perk (row, indexed by `Perk`), the confidence that it has been selected
+    # 1..n times (columns). n is the maximum quantity of the perk.
+    perks: np.ndarray = dataclasses.field(default_factory=perks_confidence_default_factory)
 
     def __iadd__(self, other: Self) -> Self:
-        for perk in self.perks.keys():
-            for i in range(0, len(self.perks[perk])):
-                self.perks[perk][i] += other.perks[perk][i]
+        self.perks += other.perks
         return self
 
     def __add__(self, other: Self) -> Self:
-        result = copy.deepcopy(self)
-        result += other
-        return result
+        return PerksConfidence(count=self.count, perks=self.perks + other.perks)
 
     def __imul__(self, factor: float | int) -> Self:
-        for perk in self.perks.keys():
-            for i in range(0, len(self.perks[perk])):
-                self.perks[perk][i] *= factor
+        self.perks *= factor
         return self
 
     def __mul__(self, factor: float | int) -> Self:
-        result = copy.deepcopy(self)
-        result *= factor
-        return result
+        return PerksConfidence(count=self.count, perks=self.perks * factor)
 
     def reduce(self) -> Perks:
-        return Perks(perks={perk: sum(confidences) for perk, confidences in self.perks.items()})
+        return Perks(perks=self.perks.sum(axis=1))
 
+    def exhausted(self) -> np.ndarray:
+        # Confidence that each perk has been selected its maximum quantity of times.
+        return self.perks[np.arange(len(Perk)), PERK_QUANTITIES - 1]
 
-def perk_options_default_factory() -> dict[str, float]:
-    return {
-        perk: 0.0
-        for perk in ALL_PERKS.keys()
-    }
 
+def perk_options_default_factory() -> np.ndarray:
+    return np.zeros(len(Perk))
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class PerkOptions:
-    options: dict[str, float] = dataclasses.field(default_factory=perk_options_default_factory)
+    # Indexed by `Perk`.
+    options: np.ndarray = dataclasses.field(default_factory=perk_options_default_factory)
 
     def __iadd__(self, other: Self) -> Self:
-        for perk in self.options.keys():
-            self.options[perk] += other.options[perk]
+        self.options += other.options
         return self
 
     def __add__(self, other: Self) -> Self:
-        result = copy.deepcopy(self)
-        result += other
-        return result
+        return PerkOptions(options=self.options + other.options)
 
     def __imul__(self, factor: float | int) -> Self:
-        for perk in self.options.keys():
-            self.options[perk] *= factor
+        self.options *= factor
         return self
 
     def __mul__(self, factor: float | int) -> Self:
-        result = copy.deepcopy(self)
-        result *= factor
-        return result
+        return PerkOptions(options=self.options * factor)
 
     def inorm(self) -> Self:
-        magnitude = sum(self.options.values())
+        magnitude = self.options.sum()
         if magnitude:
-            for perk in self.options.keys():
-                self.options[perk] /= magnitude
+            self.options /= magnitude
         return self
 
     def norm(self) -> Self:
-        result = copy.deepcopy(self)
-        result.inorm()
-        return result
+        return PerkOptions(options=self.options.copy()).inorm()
 
 
 @dataclasses.dataclass
 class PerkWaveEstimator:
-    confidences: list[PerksConfidence]
-
-    def lower(self, perk_count: float) -> PerksConfidence:
-        if perk_count < 1.0:
-            return PerksConfidence()
-        return self.confidences[math.floor(perk_count - 1.0)]
-
-    def higher(self, perk_count: float) -> PerksConfidence:
-        if perk_count >= len(self.confidences):
-            return self.confidences[-1]
-        return self.confidences[math.floor(perk_count)]
-
-    def average(self, perk_count: float) -> PerksConfidence:
-        lower_confidence = self.lower(perk_count)
-        upper_confidence = self.higher(perk_count)
-        lambda_ = perk_count % 1.0
-        return lower_confidence + (upper_confidence + lower_confidence * -1.0) * lambda_
-
-    def estimate(self, sim: Simulation, wave: int, perks: Perks) -> Perks:
-        perk_count = sum(perks.perks.values())
-        next_perk_count = perk_count_at_wave(sim, perks, wave)
-        while perk_count < next_perk_count:
-            perk_count = next_perk_count
-            perks = self.average(perk_count).reduce()
-            next_perk_count = perk_count_at_wave(sim, perks, wave)
-        return perks
-
-
-def perk_category_option_chances(sim: Simulation, options: PerkOptions, confidence: PerksConfidence, category: dict[str, int], factor: float) -> PerkOptions:
-    next_options = PerkOptions()
-    for perk in category.keys():
-        if perk not in sim.perk_bans:
-            # Perks can't appear if they are already in the option set, or if their
-            # quantity has been fully exhausted.
-            chance = (1.0 - options.options[perk])
-            chance *= (1.0 - confidence.perks[perk][-1])
-            next_options.options[perk] = chance
-    return next_options.inorm() * factor
+    confidences: tuple[PerksConfidence, ...]
+
+    def perk_counts(self, sim: Simulation, max_wave: int) -> np.ndarray:
+        """
+        Estimated number of perks earned by each wave, indexed by wave. The perks that
+        have been earned affect how quickly the next perk is earned (through PWR), so
+        this is the fixed point of `perk_count_at_wave` at every wave.
+        """
+        # Only the PWR bonus and the total quantity of the estimated perks are needed to
+        # find the fixed point, so interpolate those directly instead of the perks.
+        reduced = [confidence.reduce() for confidence in self.confidences]
+        pwr_bonuses = [float(perks.pwr_bonus(sim)) for perks in reduced]
+        totals = [float(perks.perks.sum()) for perks in reduced]
+
+        def average(values: list[float], perk_count: float) -> float:
+            count = math.floor(perk_count)
+            lower = values[max(count - 1, 0)]
+            higher = values[min(count, len(values) - 1)]
+            lambda_ = perk_count % 1.0
+            return lower + (higher + lower * -1.0) * lambda_
+
+        perk_counts = np.zeros(max_wave + 1)
+        perk_count = 0.0
+        for wave in range(1, max_wave + 1):
+            estimated_count = average(totals, perk_count)
+            next_perk_count = perk_count_at_wave(sim, average(pwr_bonuses, perk_count), wave)
+            while estimated_count < next_perk_count:
+                estimated_count = perk_count = next_perk_count
+                next_perk_count = perk_count_at_wave(sim, average(pwr_bonuses, perk_count), wave)
+            perk_counts[wave] = perk_count
+        return perk_counts
+
+    def average(self, perk_counts: np.ndarray) -> Perks:
+        """
+        Estimated perks for each of `perk_counts`, interpolated between the confidences
+        before and after each count.
+        """
+        reduced = np.array([confidence.reduce().perks for confidence in self.confidences])
+        counts = np.floor(perk_counts).astype(int)
+        # The first confidence has no perks selected, same as having no perks at all.
+        lower = reduced[np.maximum(counts - 1, 0)]
+        higher = reduced[np.minimum(counts, len(reduced) - 1)]
+        lambda_ = (perk_counts % 1.0)[:, np.newaxis]
+        return Perks(perks=(lower + (higher + lower * -1.0) * lambda_).T)
+
+
+def perk_category_option_chances(sim: Simulation, options: PerkOptions, confidence: PerksConfidence, category: np.ndarray, factor: float) -> PerkOptions:
+    # Perks can't appear if they are already in the option set, or if their quantity
+    # has been fully exhausted.
+    chances = (1.0 - options.options) * (1.0 - confidence.exhausted())
+    chances[~category | perk_mask(sim.perk_bans)] = 0.0
+    return PerkOptions(options=chances).inorm() * factor
 
 
 def perk_option_chances(sim: Simulation, options: PerkOptions, confidence: PerksConfidence) -> PerkOptions:
-    sperks = perk_category_option_chances(sim, options, confidence, STANDARD_PERKS, STANDARD_PERK_CHANCE)
-    uperks =  perk_category_option_chances(sim, options, confidence, ULTIMATE_PERKS, ULTIMATE_PERK_CHANCE)
-    tperks = perk_category_option_chances(sim, options, confidence, TRADEOFF_PERKS, TRADEOFF_PERK_CHANCE)
-    return (sperks + uperks + tperks).inorm()
+    next_options = PerkOptions()
+    for category, factor in PERK_CATEGORIES:
+        next_options += perk_category_option_chances(sim, options, confidence, category, factor)
+    return next_options.inorm()
 
 
 def perk_option_set_chances(sim: Simulation, confidence: PerksConfidence) -> PerkOptions:
     options = PerkOptions()
     options_count = sim.perk_option_quantity()
     if confidence.count == 0:
-        options.options[sim.first_perk_choice] = 1.0
+        options.options[Perk[sim.first_perk_choice]] = 1.0
         options_count -= 1
     for _ in range(0, options_count):
         options += perk_option_chances(sim, options, confidence)
@@ -987,19 +1420,20 @@ def perk_option_set_chances(sim: Simulation, confidence: PerksConfidence) -> Per
 def active_perks_confidence(sim: Simulation, confidence: PerksConfidence) -> PerksConfidence:
     options = perk_option_set_chances(sim, confidence)
 
-    lower_priority = set(ALL_PERKS.keys())
-    for high_perk in sim.perk_priority_order:
-        lower_priority.remove(high_perk)
-        for lower_perk in lower_priority:
-            options.options[lower_perk] *= (1.0 - options.options[high_perk])
+    # Each perk is only picked if no higher priority perk was offered.
+    not_offered = 1.0
+    for name in sim.perk_priority_order:
+        high_perk = Perk[name]
+        options.options[high_perk] *= not_offered
+        not_offered *= (1.0 - options.options[high_perk])
+    options.options[~perk_mask(sim.perk_priority_order)] *= not_offered
     options.inorm()
 
-    next_confidence = copy.deepcopy(confidence)
-    next_confidence.count += 1
-    for perk, probseq in next_confidence.perks.items():
-        for i in range(0, min(len(probseq), next_confidence.count)):
-            next_confidence.perks[perk][i] += (1.0 - probseq[i]) * options.options[perk]
-    return next_confidence
+    # The perk can only be selected for the n-th time once n perks have been selected.
+    count = confidence.count + 1
+    selectable = PERK_QUANTITY_MASK & (np.arange(PERK_QUANTITY_MASK.shape[1]) < count)
+    next_perks = confidence.perks + selectable * (1.0 - confidence.perks) * options.options[:, np.newaxis]
+    return PerksConfidence(count=count, perks=next_perks)
 
 
 def active_perks_confidence_sequence(sim: Simulation) -> Iterator[PerksConfidence]:
@@ -1010,61 +1444,217 @@ def active_perks_confidence_sequence(sim: Simulation) -> Iterator[PerksConfidenc
         yield confidence
 
 
-def spawn_rate_index(sim: Simulation, wave: int):
-    spawn_rate_row = (
+@functools.lru_cache(maxsize=32)
+def cached_perks_confidence_sequence(
+    perk_option_quantity_lab: int,
+    first_perk_choice: str,
+    perk_priority_order: tuple[str, ...],
+    perk_bans: tuple[str, ...],
+) -> tuple[PerksConfidence, ...]:
+    sim = Simulation(
+        perk_option_quantity_lab=perk_option_quantity_lab,
+        first_perk_choice=first_perk_choice,
+        perk_priority_order=list(perk_priority_order),
+        perk_bans=list(perk_bans),
+    )
+    return tuple(active_perks_confidence_sequence(sim))
+
+
+def perk_wave_estimator(sim: Simulation) -> PerkWaveEstimator:
+    # The confidence sequence only depends on these perk settings, which are usually
+    # shared by every sim in a command, so it is computed once and reused. The cached
+    # confidences are shared between estimators and must not be modified.
+    confidences = cached_perks_confidence_sequence(
+        sim.perk_option_quantity_lab,
+        sim.first_perk_choice,
+        tuple(sim.perk_priority_order),
+        tuple(sim.perk_bans),
+    )
+    return PerkWaveEstimator(confidences=confidences)
+
+
+@functools.lru_cache(maxsize=16)
+def cached_perk_bonus_table(
+    perk_option_quantity_lab: int,
+    first_perk_choice: str,
+    perk_priority_order: tuple[str, ...],
+    perk_bans: tuple[str, ...],
+    standard_perk_bonus_lab: int,
+    improved_tradeoff_perk_lab: int,
+    perk_waves_required_lab: int,
+    max_wave: int,
+) -> PerkBonuses:
+    sim = Simulation(
+        perk_option_quantity_lab=perk_option_quantity_lab,
+        first_perk_choice=first_perk_choice,
+        perk_priority_order=list(perk_priority_order),
+        perk_bans=list(perk_bans),
+        standard_perk_bonus_lab=standard_perk_bonus_lab,
+        improved_tradeoff_perk_lab=improved_tradeoff_perk_lab,
+        perk_waves_required_lab=perk_waves_required_lab,
+    )
+    perk_estimator = perk_wave_estimator(sim)
+    perks = perk_estimator.average(perk_estimator.perk_counts(sim, max_wave))
+    perk_bonuses = perks.bonuses(sim)
+    for field in dataclasses.fields(perk_bonuses):
+        getattr(perk_bonuses, field.name).flags.writeable = False
+    return perk_bonuses
+
+
+def perk_bonus_table(sim: Simulation, max_wave: int) -> PerkBonuses:
+    """
+    Estimated perk bonuses at every wave up to `max_wave`, indexed by wave. The perks
+    estimate only depends on the wave and the perk labs and settings, so it is shared
+    between the runs of sims with the same perk settings and must not be modified.
+    """
+    return cached_perk_bonus_table(
+        sim.perk_option_quantity_lab,
+        sim.first_perk_choice,
+        tuple(sim.perk_priority_order),
+        tuple(sim.perk_bans),
+        sim.standard_perk_bonus_lab,
+        sim.improved_tradeoff_perk_lab,
+        sim.perk_waves_required_lab,
+        max_wave,
+    )
+
+
+def spawn_rate_waves(sim: Simulation) -> list[int]:
+    return (
         SPAWN_RATE_WAVES
         if sim.wave_accelerator is None
         else WAVE_ACCELERATOR_MASTERY_TABLE[sim.wave_accelerator]
     )
-    index = max(i for i, min_wave in enumerate(spawn_rate_row) if min_wave <= wave)
-    assert 0 <= index < len(SPAWN_RATE_SEQUENCE), f"Invalid spawn rate index: {index}"
-    return index
 
 
-def elite_spawn_count(sim: Simulation, wave: int) -> float:
-    def index(table: list[int], value: int) -> int:
-        return bisect.bisect(table, value, lo=1) - 1
-
-    single_index = index(ELITE_SINGLE_SPAWN_WAVES_TABLE[sim.tier - 1], wave)
-    double_index = index(ELITE_DOUBLE_SPAWN_WAVES_TABLE[sim.tier - 1], wave)
-    single_chance = ELITE_SPAWN_CHANCE_TABLE[single_index]
-    double_chance = ELITE_SPAWN_CHANCE_TABLE[double_index]
-    combined_chance = single_chance * (1.0 + double_chance)
-    double_spawn = (
+def enemy_balance_double_spawn(sim: Simulation) -> float:
+    return (
         0.0
         if sim.enemy_balance is None
         else ENEMY_BALANCE_MASTERY_TABLE[sim.enemy_balance]
     )
-    return combined_chance * (1.0 + double_spawn)
 
 
-def fleet_spawn_count(sim: Simulation, wave: int) -> float:
+@dataclasses.dataclass(frozen=True)
+class WaveSchedule:
+    """
+    Spawn and drop schedule of every wave up to a maximum wave, indexed by wave (wave 0
+    is never simulated). The schedule only depends on the tier and the WA and EB
+    masteries, so it is shared between sims (see `wave_schedule`) and must not be
+    modified.
+    """
+
+    # Index into `SPAWN_RATE_SEQUENCE` and `SPAWN_CHANCE_TABLE`.
+    spawn_index: np.ndarray
+    elite_spawns: np.ndarray
+    fleet_spawns: np.ndarray
+    # Module shards dropped by each fleet enemy.
+    fleet_shards: np.ndarray
+
+
+@functools.lru_cache(maxsize=64)
+def cached_wave_schedule(
+    tier: int,
+    wave_accelerator: int | None,
+    enemy_balance: int | None,
+    max_wave: int,
+) -> WaveSchedule:
+    sim = Simulation(tier=tier, wave_accelerator=wave_accelerator, enemy_balance=enemy_balance)
+    waves = np.arange(0, max_wave + 1)
+
+    spawn_index = np.searchsorted(spawn_rate_waves(sim), waves, side="right") - 1
+    spawn_index = np.maximum(spawn_index, 0)
+
+    # The leading 0 of each elite table row is ignored.
+    single_index = np.searchsorted(ELITE_SINGLE_SPAWN_WAVES_TABLE[sim.tier - 1][1:], waves, side="right")
+    double_index = np.searchsorted(ELITE_DOUBLE_SPAWN_WAVES_TABLE[sim.tier - 1][1:], waves, side="right")
+    single_chance = np.take(ELITE_SPAWN_CHANCE_TABLE, single_index)
+    double_chance = np.take(ELITE_SPAWN_CHANCE_TABLE, double_index)
+    combined_chance = single_chance * (1.0 + double_chance)
+    elite_spawns = combined_chance * (1.0 + enemy_balance_double_spawn(sim))
+
+    fleet_spawns = np.zeros(len(waves))
     min_wave = FLEET_MIN_WAVE_SPAWN_TABLE[sim.tier - 1]
-    spawn_period = FLEET_SPAWN_PERIOD_WAVE_TABLE[sim.tier - 1]
-    spawn_count = FLEET_SPAWN_COUNT_TABLE[sim.tier - 1]
-    if min_wave is None or min_wave > wave:
-        return 0
-    assert spawn_period is not None
-    assert spawn_count is not None
+    if min_wave is not None:
+        spawn_period = FLEET_SPAWN_PERIOD_WAVE_TABLE[sim.tier - 1]
+        assert spawn_period is not None
+        fleet_waves = (waves >= min_wave) & ((waves - min_wave) % spawn_period == 0)
+        fleet_spawns[fleet_waves] = FLEET_SPAWN_COUNT_TABLE[sim.tier - 1]
+
+    shard_index = np.searchsorted(FLEET_MODULE_SHARD_DROP_WAVES, waves, side="right")
+    shard_index = np.minimum(shard_index, len(FLEET_MODULE_SHARD_DROP_TABLE) - 1)
+    fleet_shards = np.take(FLEET_MODULE_SHARD_DROP_VALUES, shard_index)
+
+    schedule = WaveSchedule(
+        spawn_index=spawn_index,
+        elite_spawns=elite_spawns,
+        fleet_spawns=fleet_spawns,
+        fleet_shards=fleet_shards,
+    )
+    for field in dataclasses.fields(schedule):
+        getattr(schedule, field.name).flags.writeable = False
+    return schedule
+
 
-    if (wave - min_wave) % spawn_period == 0:
-        return spawn_count
-    return 0
+def wave_schedule(sim: Simulation, max_wave: int) -> WaveSchedule:
+    return cached_wave_schedule(sim.tier, sim.wave_accelerator, sim.enemy_balance, max_wave)
 
 
-def fleet_shard_reward(sim: Simulation, wave: int) -> float:
-    index = bisect.bisect(FLEET_MODULE_SHARD_DROP_TABLE, wave, key=lambda x: x[0] if x is not None else 0)
-    index = min(index, len(FLEET_MODULE_SHARD_DROP_TABLE) - 1)
-    return FLEET_MODULE_SHARD_DROP_TABLE[index][1]
+def wave_skip_chance(sim: Simulation) -> float:
+    double_skip_chance = 0.0
+    if sim.wave_skip is not None:
+        # A double skip can only happen if a single skip is triggered.
+        double_skip_chance = WAVE_SKIP_CHANCE * WAVE_SKIP_MASTERY_TABLE[sim.wave_skip]
+    # Any given wave `w` can be skipped if:
+    # 1. `w-2` triggered a double skip, or
+    # 2. `w-2` did not trigger a double skip, but `w-1` triggered a single skip
+    return double_skip_chance + WAVE_SKIP_CHANCE * (1 - double_skip_chance)
+
 
+def wave_enemies(
+    spawn_index: int | np.ndarray,
+    common_spawns: float | np.ndarray,
+    boss_spawns: float | np.ndarray,
+    elite_spawns: float | np.ndarray,
+    fleet_spawns: float | np.ndarray,
+) -> np.ndarray:
+    fleet_children_count = (10 + 14) / 2 # Average of random number between 10-14
 
-def simulate_wave(sim: Simulation, perks: Perks, wave: int) -> Events:
-    spawn_index = spawn_rate_index(sim, wave)
+    enemies = np.zeros((len(Enemy), *np.shape(common_spawns)))
+    enemies[SPAWN_CHANCE_ENEMIES] = common_spawns * SPAWN_CHANCES[:, spawn_index]
+    enemies[Enemy.boss] = boss_spawns
+    enemies[ELITE_ENEMIES] = elite_spawns / 3
+    enemies[FLEET_ENEMIES] = fleet_spawns / 3
+    enemies[FLEET_CHILD_ENEMIES] += enemies[FLEET_ENEMIES] * fleet_children_count
+    return enemies
+
+
+def free_upgrade_chances(
+    sim: Simulation, bonus: float | np.ndarray
+) -> np.ndarray:
+    # Chances may hold one value per scenario, see `ScenarioMatrix`.
+    shape = np.broadcast_shapes(np.shape(bonus), *map(np.shape, sim.free_upgrade_chances.values()))
+    chances = np.zeros((len(FreeUpgrade), *shape))
+    for name, chance in sim.free_upgrade_chances.items():
+        chances[FreeUpgrade[name]] = chance + bonus
+    return chances
+
+
+def enemy_level_skip_chances(sim: Simulation) -> np.ndarray:
+    chances = np.zeros(len(EnemyLevelSkip))
+    for name, chance in sim.enemy_level_skip_chances.items():
+        chances[EnemyLevelSkip[name]] = chance
+    return chances
+
+
+def simulate_wave(
+    sim: Simulation, schedule: WaveSchedule, perk_bonuses: PerkBonuses, wave: int
+) -> Events:
+    spawn_index = schedule.spawn_index[wave]
     spawn_rate = SPAWN_RATE_SEQUENCE[spawn_index]
     common_spawns = WAVE_DURATION * spawn_rate * SPAWN_RATE_FACTOR
-    elite_spawns = elite_spawn_count(sim, wave)
-    fleet_spawns = fleet_spawn_count(sim, wave)
-    fleet_children_count = (10 + 14) / 2 # Average of random number between 10-14
+    elite_spawns = schedule.elite_spawns[wave]
+    fleet_spawns = schedule.fleet_spawns[wave]
 
     # Boss spawns are binary, once every N waves based on tier.
     boss_period = TIER_BOSS_PERIOD[sim.tier - 1]
@@ -1076,44 +1666,15 @@ def simulate_wave(sim: Simulation, perks: Perks, wave: int) -> Events:
     if (wave - 1) % boss_period == 0:
         package_spawn = 1
 
-    double_skip_chance = 0.0
-    if sim.wave_skip is not None:
-        # A double skip can only happen if a single skip is triggered.
-        double_skip_chance = WAVE_SKIP_CHANCE * WAVE_SKIP_MASTERY_TABLE[sim.wave_skip]
-    # Any given wave `w` can be skipped if:
-    # 1. `w-2` triggered a double skip, or
-    # 2. `w-2` did not trigger a double skip, but `w-1` triggered a single skip
-    wave_skip_chance = double_skip_chance + WAVE_SKIP_CHANCE * (1 - double_skip_chance)
-
-    free_upgrade_bonus = perks.free_upgrade_chance_bonus(sim)
-
-    enemies = {
-        **{
-            name: common_spawns * row[spawn_index]
-            for name, row in SPAWN_CHANCE_TABLE.items()
-        },
-        "boss": boss_spawn,
-        "scatter": elite_spawns / 3,
-        "vampire": elite_spawns / 3,
-        "ray": elite_spawns / 3,
-        "saboteur": fleet_spawns / 3,
-        "commander": fleet_spawns / 3,
-        "overcharge": fleet_spawns / 3,
-    }
-    enemies["fast"] += enemies["saboteur"] * fleet_children_count
-    enemies["tank"] += enemies["commander"] * fleet_children_count
-    enemies["ranged"] += enemies["overcharge"] * fleet_children_count
+    free_upgrade_bonus = perk_bonuses.free_upgrade_chance_bonus
 
     return Events(
         wave=wave,
-        wave_skip=wave_skip_chance,
-        free_upgrades={
-            name: chance + free_upgrade_bonus
-            for name, chance in sim.free_upgrade_chances.items()
-        },
+        wave_skip=wave_skip_chance(sim),
+        free_upgrades=free_upgrade_chances(sim, free_upgrade_bonus),
         recovery_packages=package_spawn,
-        enemy_level_skips=sim.enemy_level_skip_chances,
-        enemies=enemies,
+        enemy_level_skips=enemy_level_skip_chances(sim),
+        enemies=wave_enemies(spawn_index, common_spawns, boss_spawn, elite_spawns, fleet_spawns),
     )
 
 
@@ -1127,38 +1688,37 @@ def wave_skip_bonus_geom(events: Events, value: float) -> float:
 
 
 def calculate_coins(
-    sim: Simulation, perks: Perks, events: Events, previous_events: Events, previous_rewards: Rewards
+    sim: Simulation, perk_bonuses: PerkBonuses, events: Events, previous_events: Events, previous_rewards: Rewards
 ) -> float:
-    coin_bonus = TIER_COIN_BONUS[sim.tier - 1] * perks.coin_bonus(sim)
+    coin_bonus = TIER_COIN_BONUS[sim.tier - 1] * perk_bonuses.coin_bonus
     if sim.coin is not None:
         coin_bonus *= COIN_MASTERY_TABLE[sim.coin]
-    if sim.bhd_bonus > 0:
-        bhd_bonus = 1 + sim.bhd_bonus * sum(events.free_upgrades.values())
-        coin_bonus *= wave_skip_bonus_geom(events, bhd_bonus)
-    if sim.golden_combo > 0:
+    # Scenario matrices hold one BHD and golden combo value per scenario (so bonuses may
+    # gain a scenario axis). A BHD of 0 multiplies coins by exactly 1, and scenarios are
+    # grouped by whether they have golden combo (see `scenario_structure_key`).
+    if np.any(sim.bhd_bonus > 0):
+        bhd_bonus = 1 + sim.bhd_bonus * events.free_upgrades.sum(axis=0)
+        coin_bonus = coin_bonus * wave_skip_bonus_geom(events, bhd_bonus)
+    if np.any(sim.golden_combo > 0):
         # Calculate the number of enemies that died over the past two waves for the
         # golden combo exponent. Average the coin reward across the two waves.
         golden_enemies = events.total_enemy_count() + previous_events.total_enemy_count()
-        coin_bonus *= ((1 + sim.golden_combo) ** golden_enemies) / 2
+        coin_bonus = coin_bonus * (((1 + sim.golden_combo) ** golden_enemies) / 2)
 
     orb_bonus = 1.0
     if sim.extra_orb is not None:
         orb_bonus *= 1 + ((EXTRA_ORB_MASTERY_TABLE[sim.extra_orb] - 1) * sim.orb_hits)
 
-    coins_per_enemy = {
-        name: drop * coin_bonus for name, drop in COIN_DROP_TABLE.items()
-    }
+    coins_per_enemy = np.multiply.outer(COIN_DROPS, coin_bonus)
     if sim.critical_coin is not None:
-        coins_per_enemy["basic"] *= 1.0 + CRITICAL_COIN_MASTERY_TABLE[sim.critical_coin]
+        coins_per_enemy[Enemy.basic] *= 1.0 + CRITICAL_COIN_MASTERY_TABLE[sim.critical_coin]
 
-    coins = 0.0
-    for name, count in events.enemies.items():
-        coins += count * coins_per_enemy[name] * orb_bonus
+    coins = (events.enemies * coins_per_enemy * orb_bonus).sum(axis=0)
     # The original scatter and each of its splits give the same amount of coins, but
     # only scatter splits struck by orbs give the EO# bonus. We'll assume that most
     # scatters make it inside the orb line before splitting, so only count the orb
     # bonus for the original scatter.
-    coins += events.scatter_children_count() * coins_per_enemy["scatter"]
+    coins += events.scatter_children_count() * coins_per_enemy[Enemy.scatter]
     return wave_skip_bonus_lerp(events, coins, previous_rewards.coins * WAVE_SKIP_BONUS)
 
 
@@ -1173,9 +1733,7 @@ def calculate_cells(
     # Each elite *spawn* drops cells equally. Scatter splits all only count as a single
     # spawned elite. So even though we see 31 enemies killed per Scatter spawned, we
     # only get one "cell drop" event.
-    total_elite_count = (
-        events.enemies["scatter"] + events.enemies["vampire"] + events.enemies["ray"]
-    )
+    total_elite_count = events.elite_enemy_count()
 
     elite_cells = total_elite_count * cells_per_elite
     return wave_skip_bonus_lerp(
@@ -1185,7 +1743,7 @@ def calculate_cells(
 
 def calculate_rerolls(sim: Simulation, events: Events) -> float:
     rerolls_per_boss = TIER_REROLL_DROP[sim.tier - 1]
-    boss_rerolls = events.enemies["boss"] * BOSS_REROLL_SHARD_DROP_CHANCE * rerolls_per_boss
+    boss_rerolls = events.enemies[Enemy.boss] * BOSS_REROLL_SHARD_DROP_CHANCE * rerolls_per_boss
 
     total_fleet_count = events.fleet_enemy_count()
     rerolls_per_fleet = FLEET_REROLL_SHARD_DROP_TABLE[sim.tier - 1]
@@ -1207,8 +1765,8 @@ def calculate_rerolls(sim: Simulation, events: Events) -> float:
     return reroll_shards
 
 
-def calculate_modules(sim: Simulation, events: Events) -> float:
-    common_modules = events.enemies["boss"] * BOSS_COMMON_MODULE_DROP_CHANCE
+def calculate_modules(sim: Simulation, schedule: WaveSchedule, events: Events) -> float:
+    common_modules = events.enemies[Enemy.boss] * BOSS_COMMON_MODULE_DROP_CHANCE
     if sim.recovery_package is not None:
         # Recovery packages have a chance to provide modules.
         package_modules = (
@@ -1216,14 +1774,15 @@ def calculate_modules(sim: Simulation, events: Events) -> float:
             * RECOVERY_PACKAGE_CHANCE_MASTERY_TABLE[sim.recovery_package]
         )
         # Recovery packages do not provide modules on skipped waves.
-        common_modules += wave_skip_bonus_lerp(events, package_modules, 0)
+        # Package chances may hold one value per scenario, see `ScenarioMatrix`.
+        common_modules = common_modules + wave_skip_bonus_lerp(events, package_modules, 0)
     module_shards = common_modules * COMMON_MODULE_VALUE
 
-    rare_modules = events.enemies["boss"] * RARE_MODULE_DROP_CHANCE
+    rare_modules = events.enemies[Enemy.boss] * RARE_MODULE_DROP_CHANCE
     module_shards += rare_modules * RARE_MODULE_VALUE
 
     total_fleet_count = events.fleet_enemy_count()
-    shards_per_fleet = fleet_shard_reward(sim, events.wave)
+    shards_per_fleet = schedule.fleet_shards[events.wave]
     fleet_shards = total_fleet_count * FLEET_MODULE_SHARD_DROP_CHANCE * shards_per_fleet
     module_shards += fleet_shards
 
@@ -1231,356 +1790,1328 @@ def calculate_modules(sim: Simulation, events: Events) -> float:
 
 
 def calculate_rewards(
-    sim: Simulation, perks: Perks, events: Events, previous_events: Events, previous_rewards: Rewards
+    sim: Simulation,
+    schedule: WaveSchedule,
+    perk_bonuses: PerkBonuses,
+    events: Events,
+    previous_events: Events,
+    previous_rewards: Rewards,
 ) -> Rewards:
     return Rewards(
-        coins=calculate_coins(sim, perks, events, previous_events, previous_rewards),
+        coins=calculate_coins(sim, perk_bonuses, events, previous_events, previous_rewards),
         elite_cells=calculate_cells(sim, events, previous_rewards),
         reroll_shards=calculate_rerolls(sim, events),
-        module_shards=calculate_modules(sim, events),
+        module_shards=calculate_modules(sim, schedule, events),
     )
 
 
-def simulate_run(sim: Simulation) -> Iterator[SimulationWaveResult]:
-    elapsed_time = 0
-    cumulative_events = Events()
-    cumulative_rewards = Rewards()
-    previous_events = Events()
-    previous_rewards = Rewards()
+def sampled_waves(sim: Simulation, max_wave: int) -> np.ndarray:
+    """
+    Returns which waves 0..`max_wave` are kept in the results of a run:
+    - all: every wave.
+    - interesting: the waves that are plotted, see `interesting_waves`.
+    - every:N: every Nth wave.
+    - log:N: N waves, evenly spaced on a log scale.
+    - stream:N: every wave, which `run_sim` downsamples to at most N waves as they are
+      simulated, see `downsample_wave_results`.
+    The first and last waves are always kept.
+    """
+    waves = np.arange(max_wave + 1)
+    policy, _, count = sim.sample.partition(":")
+    if policy in ("all", "stream"):
+        sampled = np.full(len(waves), True)
+    elif policy == "interesting":
+        sampled = np.isin(waves, list(interesting_waves(sim)))
+    elif policy == "every":
+        sampled = waves % int(count) == 0
+    elif policy == "log":
+        sampled = np.isin(waves, np.geomspace(1, max_wave, int(count)).round())
+    else:
+        raise ValueError(f"Invalid sample policy: {sim.sample}")
+    sampled[[0, -1]] = True
+    return sampled
+
 
-    yield SimulationWaveResult(
-        wave=0,
-        elapsed_time=elapsed_time,
-        cumulative_events=copy.deepcopy(cumulative_events),
-        cumulative_rewards=copy.deepcopy(cumulative_rewards),
-    )
+@dataclasses.dataclass(slots=True)
+class SimulationState:
+    """
+    Everything `simulate_run` carries from one wave to the next, so that a run can be
+    resumed after its last simulated `wave`. Perk bonuses and the wave schedule only
+    depend on the wave, so they are recomputed instead.
+    """
 
-    perk_estimator = PerkWaveEstimator(confidences=list(active_perks_confidence_sequence(sim)))
-    perks = Perks()
+    wave: int = 0
+    elapsed_time: float = 0.0
+    cumulative_events: Events = dataclasses.field(default_factory=Events)
+    cumulative_rewards: Rewards = dataclasses.field(default_factory=Rewards)
+    previous_events: Events = dataclasses.field(default_factory=Events)
+    previous_rewards: Rewards = dataclasses.field(default_factory=Rewards)
+
+    def copy(self) -> Self:
+        return SimulationState(
+            wave=self.wave,
+            elapsed_time=self.elapsed_time,
+            cumulative_events=self.cumulative_events.copy(),
+            cumulative_rewards=dataclasses.replace(self.cumulative_rewards),
+            previous_events=self.previous_events.copy(),
+            previous_rewards=dataclasses.replace(self.previous_rewards),
+        )
 
-    # Intro sprint
+    def advance(self, wave: int, events: Events, rewards: Rewards, wave_time: float):
+        self.wave = wave
+        self.previous_events = events
+        self.cumulative_events += events
+        self.previous_rewards = rewards
+        self.cumulative_rewards += rewards
+        self.elapsed_time += wave_time
+
+    def wave_result(self) -> SimulationWaveResult:
+        return SimulationWaveResult(
+            wave=self.wave,
+            elapsed_time=self.elapsed_time,
+            cumulative_events=self.cumulative_events.copy(),
+            cumulative_rewards=dataclasses.replace(self.cumulative_rewards),
+        )
+
+
+def simulate_run(
+    sim: Simulation, state: SimulationState | None = None, last_wave: int | None = None
+) -> Iterator[SimulationWaveResult]:
+    """
+    Simulates a run wave by wave. When `state` is given, the run resumes after
+    `state.wave`, and `state` is updated in place as waves are simulated. When
+    `last_wave` is given, the run stops after that wave.
+    """
+    # Waves that aren't sampled only update the running totals, so only the sampled
+    # waves are ever copied.
+    if state is None:
+        state = SimulationState()
+    if state.wave == 0:
+        yield state.wave_result()
 
     intro_wave_count = max_intro_wave(sim)
-    for wave in range(1, intro_wave_count):
-        perks = perk_estimator.estimate(sim, wave, perks)
-        events = simulate_wave(sim, perks, wave)
+    max_wave = max(intro_wave_count, sim.max_waves)
+    sampled = sampled_waves(sim, max_wave)
+    schedule = wave_schedule(sim, max_wave)
+    perk_bonus_by_wave = perk_bonus_table(sim, max_wave)
+    if last_wave is None:
+        last_wave = max_wave
+
+    # Intro sprint
+
+    for wave in range(state.wave + 1, min(intro_wave_count, last_wave + 1)):
+        perk_bonuses = perk_bonus_by_wave.at(wave)
+        events = simulate_wave(sim, schedule, perk_bonuses, wave)
         # The only waves that don't skip during intro sprint are the 1st and every 10th.
         if wave == 1 or wave % 10 == 0:
             events.wave_skip = 0.0
             # Unskipped intro waves are guaranteed to have a boss.
-            events.enemies["boss"] = 1
+            events.enemies[Enemy.boss] = 1
         else:
             events.wave_skip = 1.0
             # Skipped intro waves are guaranteed to not have a boss.
-            events.enemies["boss"] = 0
-        rewards = calculate_rewards(sim, perks, events, previous_events, previous_rewards)
+            events.enemies[Enemy.boss] = 0
+        rewards = calculate_rewards(
+            sim, schedule, perk_bonuses, events, state.previous_events, state.previous_rewards
+        )
         # No coins, rerolls, or modules are earned during intro sprint, and cells are
         # reduced to only 20%.
         rewards = Rewards(elite_cells=rewards.elite_cells * 0.2)
         wave_time = (WAVE_DURATION + WAVE_COOLDOWN) * (1 - events.wave_skip)
-        wave_time /= (GAME_SPEED * perks.game_speed_factor(sim))
-
-        previous_events = events
-        cumulative_events += events
-        previous_rewards = rewards
-        cumulative_rewards += rewards
-        elapsed_time += wave_time
-
-        yield SimulationWaveResult(
-            wave=wave,
-            elapsed_time=elapsed_time,
-            cumulative_events=copy.deepcopy(cumulative_events),
-            cumulative_rewards=copy.deepcopy(cumulative_rewards),
-        )
+        wave_time /= (GAME_SPEED * perk_bonuses.game_speed_factor)
+        state.advance(wave, events, rewards, wave_time)
 
-    # First regular wave after intro sprint (not skippable)
+        if sampled[wave]:
+            yield state.wave_result()
 
-    perks = perk_estimator.estimate(sim, intro_wave_count, perks)
-    events = simulate_wave(sim, perks, intro_wave_count)
-    # The first wave after intro sprint is guaranteed not to skip.
-    events.wave_skip = 0.0
-    rewards = calculate_rewards(sim, perks, events, previous_events, previous_rewards)
-    wave_time = WAVE_DURATION + WAVE_COOLDOWN
-    wave_time /= (GAME_SPEED * perks.game_speed_factor(sim))
+    # First regular wave after intro sprint (not skippable)
 
-    previous_events = events
-    cumulative_events += events
-    previous_rewards = rewards
-    cumulative_rewards += rewards
-    elapsed_time += wave_time
+    if state.wave < intro_wave_count <= last_wave:
+        perk_bonuses = perk_bonus_by_wave.at(intro_wave_count)
+        events = simulate_wave(sim, schedule, perk_bonuses, intro_wave_count)
+        # The first wave after intro sprint is guaranteed not to skip.
+        events.wave_skip = 0.0
+        rewards = calculate_rewards(
+            sim, schedule, perk_bonuses, events, state.previous_events, state.previous_rewards
+        )
+        wave_time = WAVE_DURATION + WAVE_COOLDOWN
+        wave_time /= (GAME_SPEED * perk_bonuses.game_speed_factor)
+        state.advance(intro_wave_count, events, rewards, wave_time)
 
-    yield SimulationWaveResult(
-        wave=intro_wave_count,
-        elapsed_time=elapsed_time,
-        cumulative_events=copy.deepcopy(cumulative_events),
-        cumulative_rewards=copy.deepcopy(cumulative_rewards),
-    )
+        if sampled[intro_wave_count]:
+            yield state.wave_result()
 
     # Regular waves
 
-    for wave in range(intro_wave_count + 1, sim.max_waves + 1):
-        perks = perk_estimator.estimate(sim, wave, perks)
-        events = simulate_wave(sim, perks, wave)
-        rewards = calculate_rewards(sim, perks, events, previous_events, previous_rewards)
-        wave_time = (WAVE_DURATION + WAVE_COOLDOWN) * (1 - events.wave_skip)
-        wave_time /= (GAME_SPEED * perks.game_speed_factor(sim))
-
-        previous_events = events
-        cumulative_events += events
-        previous_rewards = rewards
-        cumulative_rewards += rewards
-        elapsed_time += wave_time
-
-        yield SimulationWaveResult(
-            wave=wave,
-            elapsed_time=elapsed_time,
-            cumulative_events=copy.deepcopy(cumulative_events),
-            cumulative_rewards=copy.deepcopy(cumulative_rewards),
+    for wave in range(state.wave + 1, min(sim.max_waves, last_wave) + 1):
+        perk_bonuses = perk_bonus_by_wave.at(wave)
+        events = simulate_wave(sim, schedule, perk_bonuses, wave)
+        rewards = calculate_rewards(
+            sim, schedule, perk_bonuses, events, state.previous_events, state.previous_rewards
         )
+        wave_time = (WAVE_DURATION + WAVE_COOLDOWN) * (1 - events.wave_skip)
+        wave_time /= (GAME_SPEED * perk_bonuses.game_speed_factor)
+        state.advance(wave, events, rewards, wave_time)
 
+        if sampled[wave]:
+            yield state.wave_result()
 
-def evaluate_sims(
-    sims: list[Simulation],
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    for sim in sims:
-        if sim.skip:
-            yield sim, None
-            continue
-        wave_results = list(simulate_run(sim))
-        total = reward_value(sim, wave_results[-1].cumulative_rewards)
-        yield sim, SimulationRunResult(wave_results=wave_results, total=total)
 
+# The vectorized engine computes every wave of a run at once. `PerkBonuses`, `Events`
+# and `Rewards` hold one array per field (indexed by `wave - 1`) instead of one value, so
+# the per-wave reward calculations above can be reused as-is.
 
-# Data normalization
 
+def simulate_waves(
+    sim: Simulation, schedule: WaveSchedule, perk_bonuses: PerkBonuses, waves: np.ndarray
+) -> Events:
+    spawn_index = schedule.spawn_index[waves]
+    spawn_rate = np.take(SPAWN_RATE_SEQUENCE, spawn_index)
+    common_spawns = WAVE_DURATION * spawn_rate * SPAWN_RATE_FACTOR
+    elite_spawns = schedule.elite_spawns[waves]
+    fleet_spawns = schedule.fleet_spawns[waves]
 
-def results_at_time(
-    run_result: SimulationRunResult, elapsed_time: float
-) -> tuple[SimulationWaveResult, SimulationWaveResult, float]:
-    index = bisect.bisect_left(
-        run_result.wave_results, elapsed_time, key=lambda x: x.elapsed_time
+    boss_period = TIER_BOSS_PERIOD[sim.tier - 1]
+    boss_spawns = np.where(waves % boss_period == 0, 1.0, 0.0)
+    package_spawns = np.where((waves - 1) % boss_period == 0, 1.0, sim.package_chance)
+
+    free_upgrade_bonus = perk_bonuses.free_upgrade_chance_bonus
+
+    return Events(
+        wave=waves,
+        wave_skip=np.full(len(waves), wave_skip_chance(sim)),
+        free_upgrades=free_upgrade_chances(sim, free_upgrade_bonus),
+        recovery_packages=package_spawns,
+        enemy_level_skips=np.repeat(enemy_level_skip_chances(sim)[:, np.newaxis], len(waves), axis=1),
+        enemies=wave_enemies(spawn_index, common_spawns, boss_spawns, elite_spawns, fleet_spawns),
     )
-    if index == 0:
-        first_result = run_result.wave_results[0]
-        return first_result, first_result, 0.0
-    if index == len(run_result.wave_results):
-        last_result = run_result.wave_results[-1]
-        return last_result, last_result, 1.0
-    lower_result = run_result.wave_results[index - 1]
-    higher_result = run_result.wave_results[index]
-    difference = elapsed_time - lower_result.elapsed_time
-    basis = higher_result.elapsed_time - lower_result.elapsed_time
-    assert basis != 0
-    lambda_ = difference / basis
-    return lower_result, higher_result, lambda_
 
 
-def rewards_at_time(run_result: SimulationRunResult, elapsed_time: float) -> Rewards:
-    lower_result, higher_result, lambda_ = results_at_time(run_result, elapsed_time)
-    lower_rewards = lower_result.cumulative_rewards
-    higher_rewards = higher_result.cumulative_rewards
-    return lower_rewards + (higher_rewards - lower_rewards) * lambda_
+def linear_recurrence_scan(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Solves `x[i] = a[i] * x[i - 1] + b[i]` (with `x[-1] = 0`) for every `i` at once,
+    along the last axis. Each step is an affine map, and composing affine maps is
+    associative, so this is a parallel prefix scan (Hillis-Steele) in log2(n) array
+    operations.
+    """
+    a = np.array(a, dtype=float)
+    b = np.array(b, dtype=float)
+    step = 1
+    while step < b.shape[-1]:
+        # Compose every map with the one `step` entries before it.
+        b[..., step:] += a[..., step:] * b[..., :-step]
+        a[..., step:] *= a[..., :-step]
+        step *= 2
+    return b
+
+
+def wave_skip_bonus_carry(
+    events: Events, rewards: np.ndarray, factors: np.ndarray
+) -> np.ndarray:
+    # Adds the `wave_skip_bonus_lerp` term that carries over the previous wave's
+    # rewards to rewards that were calculated without it, then scales each wave by
+    # `factors`: r[w] = factor[w] * (reward[w] + wave_skip[w] * WAVE_SKIP_BONUS * r[w - 1])
+    return linear_recurrence_scan(
+        factors * events.wave_skip * WAVE_SKIP_BONUS, factors * rewards
+    )
 
 
-def rewards_at_wave(run_result: SimulationRunResult, wave: int) -> Rewards:
-    index = bisect.bisect_left(
-        run_result.wave_results, wave, key=lambda x: x.wave
+def apply_intro_sprint(events: Events, waves: np.ndarray, intro_wave_count: int) -> np.ndarray:
+    """
+    Applies the intro sprint skips and bosses to the `events` of `waves`. Returns which
+    of `waves` are intro waves.
+    """
+    intro_waves = waves < intro_wave_count
+    # The only waves that don't skip during intro sprint are the 1st and every 10th.
+    unskipped_intro_waves = intro_waves & ((waves == 1) | (waves % 10 == 0))
+    events.wave_skip[intro_waves] = 1.0
+    events.wave_skip[unskipped_intro_waves] = 0.0
+    # The first wave after intro sprint is guaranteed not to skip.
+    events.wave_skip[waves == intro_wave_count] = 0.0
+    # Unskipped intro waves are guaranteed to have a boss, skipped intro waves are
+    # guaranteed to not have a boss.
+    events.enemies[Enemy.boss] = np.where(intro_waves, unskipped_intro_waves, events.enemies[Enemy.boss])
+    return intro_waves
+
+
+def simulate_run_waves(sim: Simulation, max_wave: int) -> tuple[Events, Rewards, np.ndarray]:
+    """
+    Events, rewards and duration of each wave 1..`max_wave` of a run (not cumulative),
+    which must include the end of intro sprint.
+    """
+    waves = np.arange(1, max_wave + 1)
+    schedule = wave_schedule(sim, len(waves))
+    perk_bonuses = perk_bonus_table(sim, len(waves)).at(waves)
+    events = simulate_waves(sim, schedule, perk_bonuses, waves)
+    intro_waves = apply_intro_sprint(events, waves, max_intro_wave(sim))
+
+    previous_events = Events(
+        enemies=np.concatenate((np.zeros((len(Enemy), 1)), events.enemies[:, :-1]), axis=1)
+    )
+    rewards = calculate_rewards(sim, schedule, perk_bonuses, events, previous_events, Rewards())
+    apply_intro_sprint_rewards(events, rewards, intro_waves)
+    return events, rewards, wave_durations(events, perk_bonuses)
+
+
+def apply_intro_sprint_rewards(events: Events, rewards: Rewards, intro_waves: np.ndarray) -> None:
+    # No coins, rerolls, or modules are earned during intro sprint, and cells are
+    # reduced to only 20%.
+    rewards.coins = wave_skip_bonus_carry(events, rewards.coins, np.where(intro_waves, 0.0, 1.0))
+    rewards.elite_cells = wave_skip_bonus_carry(events, rewards.elite_cells, np.where(intro_waves, 0.2, 1.0))
+    rewards.reroll_shards = np.where(intro_waves, 0.0, rewards.reroll_shards)
+    rewards.module_shards = np.where(intro_waves, 0.0, rewards.module_shards)
+
+
+def wave_durations(events: Events, perk_bonuses: PerkBonuses) -> np.ndarray:
+    times = (WAVE_DURATION + WAVE_COOLDOWN) * (1 - events.wave_skip)
+    times /= (GAME_SPEED * perk_bonuses.game_speed_factor)
+    return times
+
+
+def cumulative_run_result(
+    events: Events, rewards: Rewards, wave_times: np.ndarray
+) -> SimulationRunResult:
+    # The results of each wave 1..n, summed up from wave 0.
+    def cumulative(values: np.ndarray) -> np.ndarray:
+        zeros = np.zeros((*values.shape[:-1], 1))
+        return np.concatenate((zeros, np.cumsum(values, axis=-1)), axis=-1)
+
+    return SimulationRunResult(
+        wave=np.arange(len(wave_times) + 1),
+        elapsed_time=cumulative(wave_times),
+        cumulative_events=dataclasses.replace(map_events(events, cumulative), wave=0),
+        cumulative_rewards=map_rewards(rewards, cumulative),
     )
-    return run_result.wave_results[index].cumulative_rewards
 
 
-def reward_value(sim: Simulation, rewards: Rewards) -> float:
-    if sim.reward == "coins":
-        return rewards.coins
-    elif sim.reward == "cells":
-        return rewards.elite_cells
-    elif sim.reward == "rerolls":
-        return rewards.reroll_shards
-    elif sim.reward == "modules":
-        return rewards.module_shards
-    raise ValueError(f"Invalid reward: {sim.reward}")
+def simulate_run_vectorized(sim: Simulation) -> SimulationRunResult:
+    max_wave = max(max_intro_wave(sim), sim.max_waves)
+    run_result = cumulative_run_result(*simulate_run_waves(sim, max_wave))
+    if sim.sample == "all":
+        return run_result
+    return run_result.rows(sampled_waves(sim, max_wave))
 
 
-def relative_rewards(lhs: Rewards, rhs: Rewards) -> Rewards:
-    def relative_value(lhs: float, rhs: float) -> float:
-        return 0.0 if rhs == 0 else (lhs / rhs - 1.0)
+# Streaming runs keep a bounded number of evenly spaced waves without knowing the length
+# of the run up front: every `stride`th wave is kept, and once more than `max_points`
+# waves are kept every other one is dropped and `stride` is doubled. The last wave is
+# always kept, so totals are exact.
 
-    return Rewards(
-        coins=relative_value(lhs.coins, rhs.coins),
-        elite_cells=relative_value(lhs.elite_cells, rhs.elite_cells),
-        reroll_shards=relative_value(lhs.reroll_shards, rhs.reroll_shards),
-        module_shards=relative_value(lhs.module_shards, rhs.module_shards),
+
+def downsample_wave_results(
+    wave_results: Iterable[SimulationWaveResult], max_points: int
+) -> list[SimulationWaveResult]:
+    kept = []
+    stride = 1
+    last = None
+    for index, wave_result in enumerate(wave_results):
+        last = wave_result
+        if index % stride != 0:
+            continue
+        kept.append(wave_result)
+        if len(kept) > max_points:
+            kept = kept[::2]
+            stride *= 2
+    if kept[-1] is not last:
+        kept.append(last)
+    return kept
+
+
+def downsample_mask(count: int, max_points: int) -> np.ndarray:
+    # Same waves as `downsample_wave_results` for a run of `count` waves: the final
+    # stride is the smallest power of two that keeps at most `max_points` waves.
+    stride = 1
+    while count > max_points * stride:
+        stride *= 2
+    mask = np.arange(count) % stride == 0
+    mask[-1] = True
+    return mask
+
+
+def run_sim(sim: Simulation, engine: str) -> SimulationRunResult:
+    policy, _, count = sim.sample.partition(":")
+    if engine == "loop":
+        wave_results = simulate_run(sim)
+        if policy == "stream":
+            wave_results = downsample_wave_results(wave_results, int(count))
+        return stack_wave_results(wave_results)
+    elif engine == "vector":
+        run_result = simulate_run_vectorized(sim)
+        if policy == "stream":
+            run_result = run_result.rows(downsample_mask(len(run_result.wave), int(count)))
+        return run_result
+    raise ValueError(f"Invalid engine: {engine}")
+
+
+# Result cache
+#
+# Simulated runs are stored in `--cache-dir` as compressed NumPy archives, named by a
+# hash of everything that affects the run: the simulation config, the engine, the game
+# data, the simulation code and `RESULT_CACHE_VERSION`. The least recently used results are removed once the
+# cache grows past `RESULT_CACHE_MAX_BYTES`.
+#
+# A run is an exact prefix of any longer run with the same config, so each config
+# (ignoring `max_waves`) also has a checkpoint: the key of its longest cached result,
+# along with the loop engine's `SimulationState` after its last wave. Shorter runs are
+# sliced from that result, and longer runs resume from the state instead of starting
+# from wave 0.
+
+
+@functools.cache
+def game_data_hash() -> str:
+    return hashlib.sha256(repr(sorted(GAME_DATA.items())).encode()).hexdigest()
+
+
+@functools.cache
+def code_hash() -> str:
+    # Any change to this file may change simulated results, so they can't be reused.
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def result_cache_key(sim: Simulation, engine: str) -> str:
+    config = {
+        name: value
+        for name, value in dataclasses.asdict(sim).items()
+        if name not in RESULT_CACHE_IGNORED_FIELDS
+    }
+    key = json.dumps(
+        {
+            "version": RESULT_CACHE_VERSION,
+            "game_data": game_data_hash(),
+            "code": code_hash(),
+            "engine": engine,
+            "sim": config,
+        },
+        sort_keys=True,
     )
+    return hashlib.sha256(key.encode()).hexdigest()
 
 
-def truncate_sims_to_shortest(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    min_time = min(
-        run_result.wave_results[-1].elapsed_time
-        for _, run_result in sim_results
-        if run_result is not None
-    )
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
-            continue
-        index = bisect.bisect(
-            run_result.wave_results, min_time, key=lambda x: x.elapsed_time
-        )
-        wave_results = run_result.wave_results[:index]
-        total = reward_value(sim, wave_results[-1].cumulative_rewards)
-        yield sim, dataclasses.replace(
-            run_result, wave_results=wave_results, total=total
-        )
+def result_cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.npz")
 
 
-def annotate_sims_vs_baseline(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-    baseline_sim_name: str,
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    baseline_sim, baseline_results = next(
-        (sim, run_result)
-        for sim, run_result in sim_results
-        if sim.name == baseline_sim_name
+def run_result_columns(run_result: SimulationRunResult) -> dict[str, np.ndarray]:
+    return {
+        "wave": run_result.wave,
+        "elapsed_time": run_result.elapsed_time,
+        **{
+            f"events.{field.name}": getattr(run_result.cumulative_events, field.name)
+            for field in dataclasses.fields(Events)
+            if field.name != "wave"
+        },
+        **{
+            f"rewards.{field.name}": getattr(run_result.cumulative_rewards, field.name)
+            for field in dataclasses.fields(Rewards)
+        },
+    }
+
+
+def run_result_from_columns(columns: dict[str, np.ndarray]) -> SimulationRunResult:
+    return SimulationRunResult(
+        wave=columns["wave"],
+        elapsed_time=columns["elapsed_time"],
+        cumulative_events=Events(
+            **{
+                field.name: columns[f"events.{field.name}"]
+                for field in dataclasses.fields(Events)
+                if field.name != "wave"
+            }
+        ),
+        cumulative_rewards=Rewards(
+            **{
+                field.name: columns[f"rewards.{field.name}"]
+                for field in dataclasses.fields(Rewards)
+            }
+        ),
     )
-    assert baseline_results is not None
-    baseline_value = reward_value(
-        baseline_sim, baseline_results.wave_results[-1].cumulative_rewards
+
+
+def state_columns(state: SimulationState) -> dict[str, np.ndarray]:
+    columns = {
+        "state.wave": np.array(state.wave),
+        "state.elapsed_time": np.array(state.elapsed_time),
+    }
+    for name in ("cumulative_events", "previous_events"):
+        for field in dataclasses.fields(Events):
+            columns[f"state.{name}.{field.name}"] = np.array(
+                getattr(getattr(state, name), field.name)
+            )
+    for name in ("cumulative_rewards", "previous_rewards"):
+        for field in dataclasses.fields(Rewards):
+            columns[f"state.{name}.{field.name}"] = np.array(
+                getattr(getattr(state, name), field.name)
+            )
+    return columns
+
+
+def state_from_columns(columns: dict[str, np.ndarray]) -> SimulationState:
+    def column(name: str) -> Any:
+        # Scalars are stored as 0-dimensional arrays.
+        value = columns[f"state.{name}"]
+        return value.item() if value.ndim == 0 else value.copy()
+
+    def events(name: str) -> Events:
+        return Events(
+            **{field.name: column(f"{name}.{field.name}") for field in dataclasses.fields(Events)}
+        )
+
+    def rewards(name: str) -> Rewards:
+        return Rewards(
+            **{field.name: column(f"{name}.{field.name}") for field in dataclasses.fields(Rewards)}
+        )
+
+    return SimulationState(
+        wave=column("wave"),
+        elapsed_time=column("elapsed_time"),
+        cumulative_events=events("cumulative_events"),
+        cumulative_rewards=rewards("cumulative_rewards"),
+        previous_events=events("previous_events"),
+        previous_rewards=rewards("previous_rewards"),
     )
 
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
-            continue
-        run_max = reward_value(sim, run_result.wave_results[-1].cumulative_rewards)
-        relative = (run_max / baseline_value - 1.0) if baseline_value != 0 else 0.0
-        yield sim, dataclasses.replace(run_result, relative=relative)
 
+def read_cache_file(path: str) -> dict[str, np.ndarray] | None:
+    try:
+        with np.load(path) as archive:
+            columns = dict(archive)
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    # Track recent use by modification time, for eviction.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return columns
 
-def annotate_sims_vs_stone_cost(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    for sim, run_result in sim_results:
+
+def write_cache_file(cache_dir: str, path: str, columns: dict[str, np.ndarray]) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so that concurrent readers never see a partial
+    # result.
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    evict_cached_results(cache_dir, RESULT_CACHE_MAX_BYTES)
+
+
+def load_cached_result(cache_dir: str, key: str) -> SimulationRunResult | None:
+    columns = read_cache_file(result_cache_path(cache_dir, key))
+    if columns is None:
+        return None
+    try:
+        return run_result_from_columns(columns)
+    except KeyError:
+        return None
+
+
+def store_cached_result(
+    cache_dir: str, key: str, run_result: SimulationRunResult
+) -> None:
+    write_cache_file(cache_dir, result_cache_path(cache_dir, key), run_result_columns(run_result))
+
+
+def evict_cached_results(cache_dir: str, max_bytes: int) -> None:
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npz"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+
+
+def checkpoint_key(sim: Simulation, engine: str) -> str:
+    return result_cache_key(dataclasses.replace(sim, max_waves=0), engine)
+
+
+def checkpoint_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.checkpoint.npz")
+
+
+@dataclasses.dataclass
+class RunCheckpoint:
+    """A run up to its last wave, and the loop engine's state to resume it from."""
+
+    run_result: SimulationRunResult
+    state: SimulationState | None = None
+
+
+def resume_run(
+    sim: Simulation, checkpoint: RunCheckpoint | None = None, last_wave: int | None = None
+) -> RunCheckpoint:
+    """
+    Simulates `sim` with the loop engine, from the end of `checkpoint` (or from wave 0)
+    up to `last_wave` (or the end of the run). `checkpoint` is left unchanged.
+    """
+    if checkpoint is None:
+        state = SimulationState()
+        wave_results = list(simulate_run(sim, state, last_wave))
+        return RunCheckpoint(run_result=stack_wave_results(wave_results), state=state)
+
+    assert checkpoint.state is not None
+    state = checkpoint.state.copy()
+    run_result = checkpoint.run_result
+    wave_results = list(simulate_run(sim, state, last_wave))
+    if wave_results:
+        run_result = concatenate_run_results(run_result, stack_wave_results(wave_results))
+    return RunCheckpoint(run_result=run_result, state=state)
+
+
+def load_checkpoint(cache_dir: str, key: str) -> RunCheckpoint | None:
+    columns = read_cache_file(checkpoint_path(cache_dir, key))
+    if columns is None:
+        return None
+    try:
+        # The checkpoint is gone if its result has been evicted.
+        run_result = load_cached_result(cache_dir, str(columns["result_key"]))
         if run_result is None:
-            yield sim, None
+            return None
+        # Only the loop engine can resume a run, so other checkpoints have no state.
+        state = state_from_columns(columns) if "state.wave" in columns else None
+    except KeyError:
+        return None
+    return RunCheckpoint(run_result=run_result, state=state)
+
+
+def store_checkpoint(
+    cache_dir: str, key: str, checkpoint: RunCheckpoint, result_key: str
+) -> None:
+    """Stores `checkpoint`, whose run must already be cached as `result_key`."""
+    # Concurrent sims of the same config may race to store their checkpoint, only
+    # replace a shorter one (or one whose result has been evicted).
+    last_wave = int(checkpoint.run_result.wave[-1])
+    stored = read_cache_file(checkpoint_path(cache_dir, key))
+    if (
+        stored is not None
+        and "result_key" in stored
+        and int(stored.get("last_wave", -1)) >= last_wave
+        and os.path.exists(result_cache_path(cache_dir, str(stored["result_key"])))
+    ):
+        return
+    columns = {"result_key": np.array(result_key), "last_wave": np.array(last_wave)}
+    if checkpoint.state is not None:
+        columns |= state_columns(checkpoint.state)
+    write_cache_file(cache_dir, checkpoint_path(cache_dir, key), columns)
+
+
+def run_checkpointed_sim(
+    sim: Simulation,
+    engine: str,
+    cache_dir: str,
+    prefix: RunCheckpoint | None = None,
+) -> SimulationRunResult:
+    """Simulates `sim` (or slices its run from a checkpoint) and caches its result."""
+    result_key = result_cache_key(sim, engine)
+    # Only runs that keep every wave can be sliced or extended.
+    if sim.sample != "all":
+        run_result = run_forked_sim(sim, engine, prefix)
+        store_cached_result(cache_dir, result_key, run_result)
+        return run_result
+
+    key = checkpoint_key(sim, engine)
+    last_wave = max(max_intro_wave(sim), sim.max_waves)
+    checkpoint = load_checkpoint(cache_dir, key)
+    if checkpoint is not None and checkpoint.run_result.wave[-1] >= last_wave:
+        run_result = checkpoint.run_result.rows(slice(0, last_wave + 1))
+        store_cached_result(cache_dir, result_key, run_result)
+        return run_result
+
+    if checkpoint is not None and checkpoint.state is not None:
+        checkpoint = resume_run(sim, checkpoint)
+    elif engine == "loop":
+        checkpoint = resume_run(sim, prefix)
+    else:
+        checkpoint = RunCheckpoint(run_result=run_sim(sim, engine))
+    store_cached_result(cache_dir, result_key, checkpoint.run_result)
+    store_checkpoint(cache_dir, key, checkpoint, result_key)
+    return checkpoint.run_result
+
+
+# Forked runs
+#
+# Sims in a command often only differ by a mastery that can't affect the first waves of
+# a run. With the loop engine, such sims are forked from the state of an earlier sim
+# (their root) just before the first wave where they can differ, instead of simulating
+# the same waves again. The results are identical to simulating them from wave 0.
+
+
+def first_schedule_difference(lhs: WaveSchedule, rhs: WaveSchedule) -> int | None:
+    differences = np.full(len(lhs.spawn_index), False)
+    for field in dataclasses.fields(WaveSchedule):
+        differences |= getattr(lhs, field.name) != getattr(rhs, field.name)
+    # Wave 0 is never simulated.
+    waves = np.flatnonzero(differences[1:]) + 1
+    return int(waves[0]) if len(waves) > 0 else None
+
+
+def divergence_wave(sim: Simulation, reference: Simulation) -> int:
+    """
+    First wave where the results of `sim` can differ from those of `reference`, or the
+    last wave of the run if they can't.
+    """
+    intro_wave_count = max_intro_wave(sim)
+    last_wave = max(intro_wave_count, sim.max_waves)
+    wave = last_wave
+    for field in dataclasses.fields(Simulation):
+        if field.name in RESULT_CACHE_IGNORED_FIELDS:
             continue
-        stone_cost = sim.stone_cost()
-        if run_result.relative is None or stone_cost == 0:
-            yield sim, run_result
+        if getattr(sim, field.name) == getattr(reference, field.name):
             continue
+        if field.name in ("coin", "critical_coin", "extra_orb", "recovery_package"):
+            # Only coins and module shards are affected, and neither are earned during
+            # intro sprint.
+            wave = min(wave, intro_wave_count)
+        elif field.name == "cash":
+            # Only reroll shards dropped by elites are affected, which aren't earned
+            # during intro sprint either.
+            elite_waves = np.flatnonzero(wave_schedule(sim, last_wave).elite_spawns)
+            first_elite_wave = int(elite_waves[0]) if len(elite_waves) > 0 else last_wave
+            wave = min(wave, max(intro_wave_count, first_elite_wave))
+        elif field.name in ("wave_accelerator", "enemy_balance"):
+            # Only the wave schedule is affected.
+            difference = first_schedule_difference(
+                wave_schedule(sim, last_wave), wave_schedule(reference, last_wave)
+            )
+            wave = min(wave, last_wave if difference is None else difference)
+        else:
+            return 1
+    return wave
 
-        value = run_result.relative / stone_cost
-        yield sim, dataclasses.replace(run_result, roi=value)
 
+def forkable(sim: Simulation) -> bool:
+    # Downsampled runs can't be split into a prefix and the rest of the run.
+    return not sim.skip and sim.sample.partition(":")[0] != "stream"
 
-def difference_sims_vs_baseline(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-    baseline_sim_name: str,
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    baseline_results = next(
-        run_result for sim, run_result in sim_results
-        if sim.name == baseline_sim_name
-    )
-    assert baseline_results is not None
 
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
+def plan_forks(sims: list[Simulation]) -> list[tuple[int, int] | None]:
+    """
+    For each sim, the index of the root sim it is forked from and the wave where it
+    forks, or None if it is simulated from wave 0 (and can be a root itself).
+    """
+    roots = []
+    forks = []
+    for index, sim in enumerate(sims):
+        fork = None
+        if forkable(sim):
+            candidates = [(divergence_wave(sim, sims[root]), root) for root in roots]
+            wave, root = max(candidates, key=lambda candidate: candidate[0], default=(1, None))
+            if wave > 1:
+                fork = (root, wave)
+            else:
+                roots.append(index)
+        forks.append(fork)
+    return forks
+
+
+def simulate_prefixes(root: Simulation, fork_waves: Iterable[int]) -> dict[int, RunCheckpoint]:
+    """The run of `root` up to just before each of `fork_waves`, by fork wave."""
+    prefixes = {}
+    checkpoint = None
+    for fork_wave in sorted(set(fork_waves)):
+        checkpoint = resume_run(root, checkpoint, last_wave=fork_wave - 1)
+        prefixes[fork_wave] = checkpoint
+    return prefixes
+
+
+def run_prefixes(
+    sims: list[Simulation], engine: str, cache_dir: str | None = None
+) -> list[RunCheckpoint | None]:
+    """The prefix to fork each of `sims` from, if any. See `plan_forks`."""
+    if engine != "loop":
+        return [None] * len(sims)
+
+    forks = plan_forks(sims)
+    fork_waves: dict[int, list[int]] = {}
+    for sim, fork in zip(sims, forks):
+        if fork is not None and not is_cached(sim, engine, cache_dir):
+            root, wave = fork
+            fork_waves.setdefault(root, []).append(wave)
+    prefixes = {
+        root: simulate_prefixes(sims[root], waves) for root, waves in fork_waves.items()
+    }
+    sim_prefixes = [
+        None if fork is None or fork[0] not in prefixes else prefixes[fork[0]].get(fork[1])
+        for fork in forks
+    ]
+    # Roots resume from their deepest prefix too, instead of simulating it again.
+    for root, root_prefixes in prefixes.items():
+        deepest = root_prefixes[max(root_prefixes)]
+        last_wave = max(max_intro_wave(sims[root]), sims[root].max_waves)
+        if deepest.run_result.wave[-1] > last_wave:
             continue
-        difference_results = []
-        for wave_result in run_result.wave_results:
-            baseline_rewards = rewards_at_time(
-                baseline_results, wave_result.elapsed_time
-            )
-            differenced_rewards = wave_result.cumulative_rewards - baseline_rewards
-            difference_results.append(
-                dataclasses.replace(wave_result, cumulative_rewards=differenced_rewards)
-            )
-        yield sim, dataclasses.replace(run_result, wave_results=difference_results)
+        if not is_cached(sims[root], engine, cache_dir):
+            sim_prefixes[root] = deepest
+    return sim_prefixes
 
 
-def normalize_sims_vs_elapsed(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]]
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
+def run_forked_sim(
+    sim: Simulation, engine: str, prefix: RunCheckpoint | None = None
+) -> SimulationRunResult:
+    if prefix is None:
+        return run_sim(sim, engine)
+    return resume_run(sim, prefix).run_result
+
+
+def is_cached(sim: Simulation, engine: str, cache_dir: str | None) -> bool:
+    return cache_dir is not None and os.path.exists(
+        result_cache_path(cache_dir, result_cache_key(sim, engine))
+    )
+
+
+def run_cached_sim(
+    sim: Simulation,
+    engine: str,
+    cache_dir: str | None = None,
+    prefix: RunCheckpoint | None = None,
+) -> SimulationRunResult:
+    if cache_dir is None:
+        return run_forked_sim(sim, engine, prefix)
+    key = result_cache_key(sim, engine)
+    run_result = load_cached_result(cache_dir, key)
+    if run_result is None:
+        run_result = run_checkpointed_sim(sim, engine, cache_dir, prefix)
+    return run_result
+
+
+# Batched mastery levels
+#
+# The effect of some masteries is a single value looked up in their table, and every
+# event and reward of a run is an affine function of that value. Sims that only differ
+# by the level of such a mastery (like the `mastery` subcommand) are batched: only the
+# two levels with the lowest and highest effect are simulated, and the other levels are
+# interpolated between them all at once, as a (levels x waves) matrix.
+
+# Tables of effects by level, and the effect of a locked mastery, by `Simulation` field.
+AFFINE_MASTERY_EFFECTS = {
+    "cash": (CASH_MASTERY_TABLE, 0.0),
+    "coin": (COIN_MASTERY_TABLE, 1.0),
+    "critical_coin": (CRITICAL_COIN_MASTERY_TABLE, 0.0),
+    "enemy_balance": (ENEMY_BALANCE_MASTERY_TABLE, 0.0),
+    "extra_orb": (EXTRA_ORB_MASTERY_TABLE, 1.0),
+    "recovery_package": (RECOVERY_PACKAGE_CHANCE_MASTERY_TABLE, 0.0),
+}
+
+
+def mastery_effect(sim: Simulation, field: str) -> float:
+    table, locked_effect = AFFINE_MASTERY_EFFECTS[field]
+    level = getattr(sim, field)
+    return locked_effect if level is None else table[level]
+
+
+def plan_level_batches(
+    sims: list[Simulation], engine: str, cache_dir: str | None = None
+) -> list[tuple[str, list[int]]]:
+    """
+    Groups of sims (by index) that only differ by the level of one mastery of
+    `AFFINE_MASTERY_EFFECTS`, and that mastery's field. Cached sims are left out.
+    """
+    groups: dict[tuple[str, str], list[int]] = {}
+    for index, sim in enumerate(sims):
+        if sim.skip or is_cached(sim, engine, cache_dir):
             continue
-        wave_results = iter(run_result.wave_results)
-        normalized_results = [
-            copy.deepcopy(next(wave_results)),
-        ]
-        for wave_result in wave_results:
-            assert wave_result.elapsed_time != 0.0
-            normalized_rewards = wave_result.cumulative_rewards * (
-                1 / wave_result.elapsed_time
-            )
-            normalized_results.append(
-                dataclasses.replace(wave_result, cumulative_rewards=normalized_rewards)
+        for field in AFFINE_MASTERY_EFFECTS:
+            # Golden combo grows exponentially with the number of enemies.
+            if field == "enemy_balance" and sim.golden_combo > 0:
+                continue
+            locked_key = result_cache_key(dataclasses.replace(sim, **{field: None}), engine)
+            groups.setdefault((field, locked_key), []).append(index)
+
+    batches = []
+    batched = set()
+    for (field, _), indices in groups.items():
+        indices = [index for index in indices if index not in batched]
+        # Two sims are simulated to interpolate the others, so smaller batches don't
+        # save anything.
+        if len(indices) < 3:
+            continue
+        batches.append((field, indices))
+        batched.update(indices)
+    return batches
+
+
+def run_level_batch(
+    sims: list[Simulation], field: str, engine: str, cache_dir: str | None = None
+) -> list[SimulationRunResult]:
+    effects = np.array([mastery_effect(sim, field) for sim in sims])
+    low = int(np.argmin(effects))
+    high = int(np.argmax(effects))
+    low_result = run_cached_sim(sims[low], engine, cache_dir)
+    if effects[high] == effects[low]:
+        return [low_result] * len(sims)
+    high_result = run_cached_sim(sims[high], engine, cache_dir)
+    if not np.array_equal(low_result.wave, high_result.wave):
+        # Sampled differently, so the waves can't be matched up.
+        return [run_cached_sim(sim, engine, cache_dir) for sim in sims]
+
+    weights = (effects - effects[low]) / (effects[high] - effects[low])
+    low_columns = run_result_columns(low_result)
+    high_columns = run_result_columns(high_result)
+    columns = [{"wave": low_result.wave} for _ in sims]
+    for name, low_column in low_columns.items():
+        if name == "wave":
+            continue
+        levels = low_column + np.multiply.outer(weights, high_columns[name] - low_column)
+        for level_columns, level_column in zip(columns, levels):
+            level_columns[name] = level_column
+
+    run_results = [run_result_from_columns(level_columns) for level_columns in columns]
+    run_results[low] = low_result
+    run_results[high] = high_result
+    if cache_dir is not None:
+        for index, (sim, run_result) in enumerate(zip(sims, run_results)):
+            if index not in (low, high):
+                store_cached_result(cache_dir, result_cache_key(sim, engine), run_result)
+    return run_results
+
+
+def run_level_batches(
+    sims: list[Simulation], engine: str, cache_dir: str | None = None
+) -> dict[int, SimulationRunResult]:
+    """The run of each batched sim, by index. See `plan_level_batches`."""
+    run_results = {}
+    for field, indices in plan_level_batches(sims, engine, cache_dir):
+        batch = run_level_batch([sims[index] for index in indices], field, engine, cache_dir)
+        run_results.update(zip(indices, batch))
+    return run_results
+
+
+# Scenario matrices
+#
+# Sweeps mostly vary workshop and module inputs that only scale the events and rewards
+# of each wave, without changing which enemies spawn. Sims that only differ by those
+# inputs are compiled into a `ScenarioMatrix` (one array per input, with one value per
+# scenario), and the vector engine simulates all of them at once as (scenarios x waves)
+# arrays, in chunks of scenarios that fit in `SCENARIO_MATRIX_MAX_BYTES`.
+
+# Simulation fields that hold one value per scenario, along with each free upgrade
+# chance.
+SCENARIO_FIELDS = ["orb_hits", "package_chance", "bhd_bonus", "golden_combo"]
+SCENARIO_MATRIX_MAX_BYTES = 1 << 28
+# Rough size of the arrays of one wave of one scenario while it's simulated, dominated by
+# the coins dropped by each enemy.
+SCENARIO_WAVE_BYTES = 8 * (4 * len(Enemy) + 2 * (len(FreeUpgrade) + 4))
+
+
+@dataclasses.dataclass
+class ScenarioMatrix:
+    """
+    Sims that only differ by their `SCENARIO_FIELDS` and free upgrade chances. `sim` is
+    the first of them, `indices` are their positions in the list they were compiled from
+    and `parameters` holds one array per field (with one value per scenario), named
+    `free_upgrade_chances.<name>` for free upgrade chances.
+    """
+
+    sim: Simulation
+    indices: list[int]
+    parameters: dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def scenario_sim(self, row: int) -> Simulation:
+        """`sim` with the parameters of scenario `row`."""
+        return dataclasses.replace(
+            self.sim,
+            **{field: float(self.parameters[field][row]) for field in SCENARIO_FIELDS},
+            free_upgrade_chances={
+                name: float(self.parameters[f"free_upgrade_chances.{name}"][row])
+                for name in self.sim.free_upgrade_chances
+            },
+        )
+
+    def column_sim(self, rows: slice) -> Simulation:
+        """
+        `sim` with a column of the parameters of `rows` instead of each value, so that
+        the results that depend on them get a scenario axis just before the wave axis.
+        """
+        columns = {name: values[rows, np.newaxis] for name, values in self.parameters.items()}
+        return dataclasses.replace(
+            self.sim,
+            **{field: columns[field] for field in SCENARIO_FIELDS},
+            free_upgrade_chances={
+                name: columns[f"free_upgrade_chances.{name}"]
+                for name in self.sim.free_upgrade_chances
+            },
+        )
+
+
+def scenario_structure_key(sim: Simulation, engine: str) -> str:
+    # Golden combo halves coins, so it can't be mixed with sims without it.
+    return result_cache_key(
+        dataclasses.replace(
+            sim,
+            orb_hits=0.0,
+            package_chance=0.0,
+            bhd_bonus=0.0,
+            golden_combo=float(sim.golden_combo > 0),
+            free_upgrade_chances=dict.fromkeys(sim.free_upgrade_chances, 0.0),
+        ),
+        engine,
+    )
+
+
+def compile_scenarios(sims: list[Simulation], engine: str = "vector") -> list[ScenarioMatrix]:
+    groups: dict[str, list[int]] = {}
+    for index, sim in enumerate(sims):
+        groups.setdefault(scenario_structure_key(sim, engine), []).append(index)
+
+    matrices = []
+    for indices in groups.values():
+        group = [sims[index] for index in indices]
+        parameters = {
+            field: np.array([getattr(sim, field) for sim in group], dtype=float)
+            for field in SCENARIO_FIELDS
+        }
+        for name in group[0].free_upgrade_chances:
+            parameters[f"free_upgrade_chances.{name}"] = np.array(
+                [sim.free_upgrade_chances[name] for sim in group], dtype=float
             )
-        yield sim, dataclasses.replace(run_result, wave_results=normalized_results)
+        matrices.append(ScenarioMatrix(sim=group[0], indices=indices, parameters=parameters))
+    return matrices
 
 
-def normalize_sims_vs_baseline(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-    baseline_sim_name: str,
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    baseline_results = next(
-        run_result for sim, run_result in sim_results if sim.name == baseline_sim_name
+def simulate_scenario_waves(sim: Simulation, max_wave: int) -> tuple[Events, Rewards, np.ndarray]:
+    """
+    Same as `simulate_run_waves` for a `ScenarioMatrix.column_sim`. Events and rewards
+    that depend on the scenario parameters have a scenario axis before the wave axis.
+    """
+    waves = np.arange(1, max_wave + 1)
+    schedule = wave_schedule(sim, len(waves))
+    perk_bonuses = perk_bonus_table(sim, len(waves)).at(waves)
+    events = simulate_waves(sim, schedule, perk_bonuses, waves)
+    intro_waves = apply_intro_sprint(events, waves, max_intro_wave(sim))
+
+    previous_events = Events(
+        enemies=np.concatenate((np.zeros((len(Enemy), 1)), events.enemies[:, :-1]), axis=1)
+    )
+    # Enemies and perk bonuses don't depend on the scenario, but the coins they give do,
+    # so give them a scenario axis of length 1 to broadcast against.
+    scenario_events = dataclasses.replace(events, enemies=events.enemies[:, np.newaxis])
+    scenario_perk_bonuses = PerkBonuses(
+        **{
+            field.name: getattr(perk_bonuses, field.name)[np.newaxis]
+            for field in dataclasses.fields(PerkBonuses)
+        }
+    )
+    rewards = calculate_rewards(
+        sim, schedule, scenario_perk_bonuses, scenario_events, previous_events, Rewards()
+    )
+    apply_intro_sprint_rewards(events, rewards, intro_waves)
+    return events, rewards, wave_durations(events, perk_bonuses)
+
+
+def has_scenario_layout(values: np.ndarray, run_shape: tuple[int, ...], scenario_count: int) -> bool:
+    # The shape of a single run's values, optionally with a scenario axis of length 1
+    # or `scenario_count` before the wave axis.
+    *shape, wave_count = run_shape
+    return np.shape(values) in (
+        tuple(run_shape),
+        (*shape, 1, wave_count),
+        (*shape, scenario_count, wave_count),
     )
-    assert baseline_results is not None
 
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
+
+def scenario_waves_layout_ok(
+    events: Events, rewards: Rewards, wave_times: np.ndarray, scenario_count: int
+) -> bool:
+    wave_count = len(events.wave)
+    run_shapes = {
+        "wave_skip": (wave_count,),
+        "free_upgrades": (len(FreeUpgrade), wave_count),
+        "recovery_packages": (wave_count,),
+        "enemy_level_skips": (len(EnemyLevelSkip), wave_count),
+        "enemies": (len(Enemy), wave_count),
+    }
+    return (
+        all(
+            has_scenario_layout(getattr(events, name), run_shape, scenario_count)
+            for name, run_shape in run_shapes.items()
+        )
+        and all(
+            has_scenario_layout(getattr(rewards, field.name), (wave_count,), scenario_count)
+            for field in dataclasses.fields(Rewards)
+        )
+        and np.shape(wave_times) == (wave_count,)
+    )
+
+
+def scenario_row(values: np.ndarray, row: int, run_ndim: int) -> np.ndarray:
+    # Values that don't depend on the scenario have no scenario axis, or one of length 1.
+    if np.ndim(values) == run_ndim:
+        return values
+    return values[..., min(row, values.shape[-2] - 1), :]
+
+
+def run_scenario_matrix(
+    matrix: ScenarioMatrix, max_bytes: int = SCENARIO_MATRIX_MAX_BYTES
+) -> list[SimulationRunResult]:
+    """The vector engine's run of each scenario of `matrix`, in order."""
+    sim = matrix.sim
+    max_wave = max(max_intro_wave(sim), sim.max_waves)
+    sampled = sampled_waves(sim, max_wave)
+    policy, _, count = sim.sample.partition(":")
+    chunk_size = max(1, max_bytes // (SCENARIO_WAVE_BYTES * max_wave))
+
+    run_results = []
+    for start in range(0, len(matrix), chunk_size):
+        rows = slice(start, start + chunk_size)
+        scenario_count = len(matrix.indices[rows])
+        scenario_waves = simulate_scenario_waves(matrix.column_sim(rows), max_wave)
+        if not scenario_waves_layout_ok(*scenario_waves, scenario_count):
+            # Some result can't be split by scenario, so simulate them one by one.
+            run_results += [
+                run_sim(matrix.scenario_sim(row), "vector")
+                for row in range(start, start + scenario_count)
+            ]
             continue
-        normalized_results = []
-        relative = 0.0
-        for wave_result in run_result.wave_results:
-            baseline_rewards = rewards_at_time(
-                baseline_results, wave_result.elapsed_time
+        chunk_result = cumulative_run_result(*scenario_waves)
+        if sim.sample != "all":
+            chunk_result = chunk_result.rows(sampled)
+        events = chunk_result.cumulative_events
+        for row in range(scenario_count):
+            run_result = dataclasses.replace(
+                chunk_result,
+                cumulative_events=dataclasses.replace(
+                    events,
+                    free_upgrades=scenario_row(events.free_upgrades, row, 2),
+                    recovery_packages=scenario_row(events.recovery_packages, row, 1),
+                ),
+                cumulative_rewards=map_rewards(
+                    chunk_result.cumulative_rewards, lambda values: scenario_row(values, row, 1)
+                ),
             )
-            normalized_rewards = relative_rewards(
-                wave_result.cumulative_rewards, baseline_rewards
-            )
-            relative = reward_value(sim, normalized_rewards)
-            normalized_results.append(
-                dataclasses.replace(wave_result, cumulative_rewards=normalized_rewards)
-            )
-        yield sim, dataclasses.replace(
-            run_result, wave_results=normalized_results, relative=relative
-        )
+            if policy == "stream":
+                run_result = run_result.rows(downsample_mask(len(run_result.wave), int(count)))
+            run_results.append(run_result)
+    return run_results
 
 
-def normalize_sims_vs_stone_cost(
-    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
-) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
-    for sim, run_result in sim_results:
-        if run_result is None:
-            yield sim, None
+def run_scenario_matrices(
+    sims: list[Simulation],
+    engine: str,
+    cache_dir: str | None = None,
+    excluded: Iterable[int] = (),
+) -> dict[int, SimulationRunResult]:
+    """
+    The run of each sim (by index) simulated in a scenario matrix of at least two sims,
+    with the vector engine. Skipped, cached and `excluded` sims are left out.
+    """
+    if engine != "vector":
+        return {}
+    excluded = set(excluded)
+    indices = [
+        index
+        for index, sim in enumerate(sims)
+        if index not in excluded and not sim.skip and not is_cached(sim, engine, cache_dir)
+    ]
+
+    run_results = {}
+    for matrix in compile_scenarios([sims[index] for index in indices], engine):
+        if len(matrix) < 2:
             continue
-        normalized_results = []
-        stone_cost = sim.stone_cost()
-        roi = None
-        if stone_cost == 0:
-            for wave_result in run_result.wave_results:
-                normalized_results.append(
-                    dataclasses.replace(wave_result, cumulative_rewards=Rewards())
-                )
-        else:
-            for wave_result in run_result.wave_results:
-                factor = 1 / stone_cost
-                roi = reward_value(sim, wave_result.cumulative_rewards) * factor
-                normalized_rewards = wave_result.cumulative_rewards * factor
-                normalized_results.append(
-                    dataclasses.replace(
-                        wave_result, cumulative_rewards=normalized_rewards
-                    )
-                )
-        yield sim, dataclasses.replace(
-            run_result, wave_results=normalized_results, roi=roi
+        for row, run_result in zip(matrix.indices, run_scenario_matrix(matrix)):
+            index = indices[row]
+            run_results[index] = run_result
+            if cache_dir is not None:
+                store_cached_result(cache_dir, result_cache_key(sims[index], engine), run_result)
+    return run_results
+
+
+def with_total(sim: Simulation, run_result: SimulationRunResult) -> SimulationRunResult:
+    return dataclasses.replace(run_result, total=final_reward_value(sim, run_result))
+
+
+def evaluate_sim(
+    sim: Simulation,
+    engine: str,
+    cache_dir: str | None = None,
+    prefix: RunCheckpoint | None = None,
+) -> SimulationRunResult | None:
+    if sim.skip:
+        return None
+    return with_total(sim, run_cached_sim(sim, engine, cache_dir, prefix))
+
+
+def evaluate_forked_sim(
+    sim_and_prefix: tuple[Simulation, RunCheckpoint | None],
+    engine: str,
+    cache_dir: str | None = None,
+) -> SimulationRunResult | None:
+    sim, prefix = sim_and_prefix
+    return evaluate_sim(sim, engine, cache_dir, prefix)
+
+
+def evaluate_sims(
+    args: argparse.Namespace,
+    sims: list[Simulation],
+) -> Iterator[tuple[Simulation, SimulationRunResult | None]]:
+    cache_dir = args.cache_dir if args.cache else None
+    batched = run_level_batches(sims, args.engine, cache_dir)
+    batched.update(run_scenario_matrices(sims, args.engine, cache_dir, excluded=batched))
+    unbatched = [sim for index, sim in enumerate(sims) if index not in batched]
+    prefixes = run_prefixes(unbatched, args.engine, cache_dir)
+    if args.jobs == 1:
+        run_results = (
+            evaluate_sim(sim, args.engine, cache_dir, prefix)
+            for sim, prefix in zip(unbatched, prefixes)
         )
+    else:
+        # Once batched and forked, sims are independent, so run them in worker
+        # processes. Results are still yielded in the same order as `sims`, as soon as
+        # each one is ready.
+        evaluate = functools.partial(evaluate_forked_sim, engine=args.engine, cache_dir=cache_dir)
+        pool = Pool(args.jobs or None)
+        run_results = pool.imap(evaluate, zip(unbatched, prefixes))
+
+    try:
+        for index, sim in enumerate(sims):
+            if index in batched:
+                yield sim, with_total(sim, batched[index])
+            else:
+                yield sim, next(run_results)
+    finally:
+        if args.jobs != 1:
+            pool.terminate()
+
+
+# Data normalization
+
+
+def results_at_time(
+    run_result: SimulationRunResult, elapsed_time: float
+) -> tuple[int, int, float]:
+    index = int(np.searchsorted(run_result.elapsed_time, elapsed_time, side="left"))
+    if index == 0:
+        return 0, 0, 0.0
+    if index == len(run_result.elapsed_time):
+        return index - 1, index - 1, 1.0
+    difference = elapsed_time - run_result.elapsed_time[index - 1]
+    basis = run_result.elapsed_time[index] - run_result.elapsed_time[index - 1]
+    assert basis != 0
+    lambda_ = difference / basis
+    return index - 1, index, lambda_
+
+
+def rewards_at_index(run_result: SimulationRunResult, index: int) -> Rewards:
+    return map_rewards(run_result.cumulative_rewards, lambda column: column[index])
+
+
+def rewards_at_time(run_result: SimulationRunResult, elapsed_time: float) -> Rewards:
+    lower_index, higher_index, lambda_ = results_at_time(run_result, elapsed_time)
+    lower_rewards = rewards_at_index(run_result, lower_index)
+    higher_rewards = rewards_at_index(run_result, higher_index)
+    return lower_rewards + (higher_rewards - lower_rewards) * lambda_
+
+
+def interpolate_at_times(
+    run_result: SimulationRunResult, elapsed_times: np.ndarray
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Returns a function that interpolates a column of `run_result` at every one of
+    `elapsed_times` at once, the same way as `rewards_at_time`.
+    """
+    # Skipped waves take no time, so elapsed times repeat. `rewards_at_time`
+    # interpolates towards the first result at a repeated time, while np.interp uses the
+    # last one, so interpolate over the run in reverse (with negated times to keep them
+    # increasing).
+    times = -run_result.elapsed_time[::-1]
+
+    def interpolate(column: np.ndarray) -> np.ndarray:
+        if column.ndim > 1:
+            return np.array([interpolate(row) for row in column])
+        return np.interp(-elapsed_times, times, column[::-1])
+
+    return interpolate
+
+
+def rewards_at_times(run_result: SimulationRunResult, elapsed_times: np.ndarray) -> Rewards:
+    return map_rewards(
+        run_result.cumulative_rewards, interpolate_at_times(run_result, elapsed_times)
+    )
+
+
+def resample_time_grid(
+    sim_results: list[tuple[Simulation, SimulationRunResult | None]],
+    step: float,
+    resample_to: str,
+) -> np.ndarray:
+    end_times = [
+        run_result.elapsed_time[-1]
+        for _, run_result in sim_results
+        if run_result is not None
+    ]
+    end_time = min(end_times) if resample_to == "shortest" else max(end_times)
+    # The grid ends on the end of the run it extends to, so that runs cut at the end
+    # of the grid still line up.
+    return np.append(np.arange(0.0, end_time, step), end_time)
+
+
+def resample_run(
+    run_result: SimulationRunResult, time_grid: np.ndarray
+) -> SimulationRunResult:
+    # Runs shorter than the grid stop at their own end, which is always kept so that
+    # final values are unchanged. Longer runs are cut at the end of the grid.
+    end_time = min(run_result.elapsed_time[-1], time_grid[-1])
+    elapsed_times = np.append(time_grid[time_grid < end_time], end_time)
+    interpolate = interpolate_at_times(run_result, elapsed_times)
+    return dataclasses.replace(
+        run_result,
+        wave=interpolate(run_result.wave.astype(float)),
+        elapsed_time=elapsed_times,
+        cumulative_events=map_events(run_result.cumulative_events, interpolate),
+        cumulative_rewards=map_rewards(run_result.cumulative_rewards, interpolate),
+    )
+
+
+def rewards_at_wave(run_result: SimulationRunResult, wave: int) -> Rewards:
+    index = int(np.searchsorted(run_result.wave, wave, side="left"))
+    return rewards_at_index(run_result, index)
+
+
+def reward_value(sim: Simulation, rewards: Rewards) -> Any:
+    if sim.reward == "coins":
+        return rewards.coins
+    elif sim.reward == "cells":
+        return rewards.elite_cells
+    elif sim.reward == "rerolls":
+        return rewards.reroll_shards
+    elif sim.reward == "modules":
+        return rewards.module_shards
+    raise ValueError(f"Invalid reward: {sim.reward}")
+
+
+def final_reward_value(sim: Simulation, run_result: SimulationRunResult) -> float:
+    return float(reward_value(sim, run_result.cumulative_rewards)[-1])
+
+
+def relative_rewards(lhs: Rewards, rhs: Rewards) -> Rewards:
+    def relative_value(lhs: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+        nonzero = rhs != 0
+        return np.where(nonzero, lhs / np.where(nonzero, rhs, 1.0) - 1.0, 0.0)
+
+    return Rewards(
+        coins=relative_value(lhs.coins, rhs.coins),
+        elite_cells=relative_value(lhs.elite_cells, rhs.elite_cells),
+        reroll_shards=relative_value(lhs.reroll_shards, rhs.reroll_shards),
+        module_shards=relative_value(lhs.module_shards, rhs.module_shards),
+    )
 
 
 def normalize_sims(
@@ -1588,23 +3119,130 @@ def normalize_sims(
     sim_results: list[tuple[Simulation, SimulationRunResult | None]],
     baseline_sim_name: str,
 ) -> list[tuple[Simulation, SimulationRunResult | None]]:
+    """
+    Normalize the rewards of every run in a single pass, in this order:
+    0. `--truncate`: cut every run at the end of the shortest run.
+    1. `--resample`: resample every run onto a common time grid. With `--truncate`,
+       the grid only extends to the end of the shortest run.
+    2. `--elapsed`: divide rewards by elapsed time.
+    3. `--relative`: divide rewards by the baseline's rewards at the same time, minus 1.
+       Otherwise, only annotate runs with their final reward relative to the baseline.
+    4. `--roi`: divide relative rewards by stone cost. Otherwise, only annotate runs
+       with their final relative reward per stone.
+    5. `--difference`: subtract the baseline's rewards at the same time.
+    The baseline is compared after steps 0 to 2 have been applied to it, with every
+    wave of its run even if runs only keep some waves (see `--sample`).
+    """
+    time_grid = None
+    if args.resample is not None:
+        resample_to = "shortest" if args.truncate else args.resample_to
+        time_grid = resample_time_grid(sim_results, args.resample, resample_to)
+
+    min_time = None
     if args.truncate:
-        sim_results = list(truncate_sims_to_shortest(sim_results))
-    if args.elapsed:
-        sim_results = list(normalize_sims_vs_elapsed(sim_results))
-    if args.relative:
-        sim_results = list(normalize_sims_vs_baseline(sim_results, baseline_sim_name))
-        if args.roi:
-            sim_results = list(normalize_sims_vs_stone_cost(sim_results))
+        min_time = min(
+            run_result.elapsed_time[-1]
+            for _, run_result in sim_results
+            if run_result is not None
+        )
+
+    cache_dir = args.cache_dir if args.cache else None
+
+    def truncate(sim: Simulation, run_result: SimulationRunResult) -> SimulationRunResult:
+        index = np.searchsorted(run_result.elapsed_time, min_time, side="right")
+        truncated = run_result.rows(slice(0, index))
+        if sim.sample != "all" and index < len(run_result.wave):
+            # The last wave before `min_time` may not have been sampled, so find it in a
+            # run with every wave up to the next sampled wave.
+            full_sim = dataclasses.replace(
+                sim, sample="all", max_waves=int(run_result.wave[index])
+            )
+            full_result = run_cached_sim(full_sim, args.engine, cache_dir)
+            full_index = np.searchsorted(full_result.elapsed_time, min_time, side="right")
+            if full_result.wave[full_index - 1] != truncated.wave[-1]:
+                last_wave = full_result.rows(slice(full_index - 1, full_index))
+                truncated = concatenate_run_results(truncated, last_wave)
+        return with_total(sim, truncated)
+
+    def rescale(sim: Simulation, run_result: SimulationRunResult) -> SimulationRunResult:
+        # Truncate before resampling, so that runs are cut at their last wave before
+        # `min_time` whether or not they are resampled.
+        if min_time is not None:
+            run_result = truncate(sim, run_result)
+        if time_grid is not None:
+            run_result = resample_run(run_result, time_grid)
+        if args.elapsed:
+            # The first wave result (at time zero) is left as-is.
+            assert np.all(run_result.elapsed_time[1:] != 0.0)
+            factors = np.ones(len(run_result.elapsed_time))
+            factors[1:] = 1 / run_result.elapsed_time[1:]
+            run_result = dataclasses.replace(
+                run_result, cumulative_rewards=run_result.cumulative_rewards * factors
+            )
+        return run_result
+
+    baseline_sim, baseline_results = next(
+        (sim, run_result)
+        for sim, run_result in sim_results
+        if sim.name == baseline_sim_name
+    )
+    assert baseline_results is not None
+    baseline_results = rescale(baseline_sim, baseline_results)
+    baseline_value = final_reward_value(baseline_sim, baseline_results)
+
+    # Runs are compared against the baseline at the times of their own waves. When runs
+    # only keep some waves, interpolating between the baseline's sampled waves would
+    # skew the comparison (and the final relative values), so compare against the
+    # baseline's run with every wave.
+    compared_results = baseline_results
+    if baseline_sim.sample != "all" and (args.relative or args.difference):
+        full_sim = dataclasses.replace(baseline_sim, sample="all")
+        compared_results = rescale(full_sim, run_cached_sim(full_sim, args.engine, cache_dir))
+
+    normalized_results = []
+    for sim, run_result in sim_results:
+        if run_result is None:
+            normalized_results.append((sim, None))
+            continue
+        run_result = (
+            baseline_results if sim.name == baseline_sim_name else rescale(sim, run_result)
+        )
+        rewards = run_result.cumulative_rewards
+
+        if args.relative:
+            baseline_rewards = rewards_at_times(compared_results, run_result.elapsed_time)
+            rewards = relative_rewards(rewards, baseline_rewards)
+            relative = float(reward_value(sim, rewards)[-1])
         else:
-            sim_results = list(annotate_sims_vs_stone_cost(sim_results))
-    else:
-        sim_results = list(annotate_sims_vs_baseline(sim_results, baseline_sim_name))
-        sim_results = list(annotate_sims_vs_stone_cost(sim_results))
-    if args.difference:
-        sim_results = list(difference_sims_vs_baseline(sim_results, baseline_sim_name))
+            run_value = final_reward_value(sim, run_result)
+            relative = (run_value / baseline_value - 1.0) if baseline_value != 0 else 0.0
 
-    return sim_results
+        stone_cost = sim.stone_cost()
+        roi = None
+        if args.relative and args.roi:
+            if stone_cost == 0:
+                rewards = map_rewards(rewards, np.zeros_like)
+            else:
+                factor = 1 / stone_cost
+                roi = relative * factor
+                rewards = rewards * factor
+        elif stone_cost != 0:
+            roi = relative / stone_cost
+
+        if args.difference:
+            baseline_rewards = rewards_at_times(compared_results, run_result.elapsed_time)
+            rewards = rewards - baseline_rewards
+
+        normalized_results.append(
+            (
+                sim,
+                dataclasses.replace(
+                    run_result, cumulative_rewards=rewards, relative=relative, roi=roi
+                ),
+            )
+        )
+
+    return normalized_results
 
 
 # Simulation config factories
@@ -1616,6 +3254,7 @@ def make_sim(args: argparse.Namespace) -> Simulation:
         orb_hits=args.orb_hits,
         reward=args.reward,
         sum_total_stone_cost=args.sum_total_stone_cost,
+        sample=args.sample,
         bhd_bonus=(args.bhd / 100),
         golden_combo=(args.golden_combo / 100),
         free_upgrade_chances={
@@ -1623,6 +3262,7 @@ def make_sim(args: argparse.Namespace) -> Simulation:
             "defense": (args.freeup_chance[1] / 100),
             "utility": (args.freeup_chance[2] / 100),
         },
+        package_chance=(args.package_chance / 100),
         cash=args.cash,
         coin=args.coin,
         critical_coin=args.critical_coin,
@@ -1710,9 +3350,8 @@ def calculate_margins(
     for _, run_result in sim_results:
         if run_result is None:
             continue
-        for wave_result in run_result.wave_results:
-            min_time = min(min_time, wave_result.elapsed_time)
-            max_time = max(max_time, wave_result.elapsed_time)
+        min_time = min(min_time, run_result.elapsed_time.min())
+        max_time = max(max_time, run_result.elapsed_time.max())
     time_partition = (max_time - min_time) / 3
 
     # Find the minmax of the data set globally and within the last 2/3 time range.
@@ -1724,18 +3363,18 @@ def calculate_margins(
     for sim, run_result in sim_results:
         if run_result is None:
             continue
-        for wave_result in run_result.wave_results:
-            value = reward_value(sim, wave_result.cumulative_rewards)
-            min_value = min(min_value, value)
-            max_value = max(max_value, value)
-            if wave_result.elapsed_time >= time_partition:
-                min_inlier = min(min_inlier, value)
-                max_inlier = max(max_inlier, value)
-                values.append(value)
+        run_values = reward_value(sim, run_result.cumulative_rewards)
+        min_value = min(min_value, run_values.min())
+        max_value = max(max_value, run_values.max())
+        inliers = run_values[run_result.elapsed_time >= time_partition]
+        if len(inliers) > 0:
+            min_inlier = min(min_inlier, inliers.min())
+            max_inlier = max(max_inlier, inliers.max())
+        values.append(inliers)
 
     # Calculate mean and sigma over the last 2/3 of the data set.
-    mean = np.mean(values)
-    stddev = np.std(values)
+    mean = np.mean(np.concatenate(values))
+    stddev = np.std(np.concatenate(values))
     sigma = mean - 3.0 * stddev
 
     # Dilate the inliers up to 3-sigma over the mean to reach the global min/max.
@@ -1802,13 +3441,14 @@ def plot_sim_results(
             relative=run_result.relative,
             roi=run_result.roi,
         )
-        waves_to_plot = interesting_waves(sim)
-        for wave_result in run_result.wave_results:
-            if wave_result.wave not in waves_to_plot:
-                continue
-            value = reward_value(sim, wave_result.cumulative_rewards)
-            line.xs.append(wave_result.elapsed_time / 3600)
-            line.ys.append(value)
+        if args.resample is not None or sim.sample != "all":
+            # The run has already been reduced to the waves worth plotting.
+            waves_to_plot = np.full(len(run_result.wave), True)
+        else:
+            waves_to_plot = np.isin(run_result.wave, list(interesting_waves(sim)))
+        values = reward_value(sim, run_result.cumulative_rewards)
+        line.xs = (run_result.elapsed_time[waves_to_plot] / 3600).tolist()
+        line.ys = values[waves_to_plot].tolist()
         plot.lines.append(line)
 
     if args.relative and args.crop:
@@ -1818,7 +3458,7 @@ def plot_sim_results(
 
 
 def render_plot(plot: Plot, /, show: bool = True, output: str | None = None):
-    _, ax = plt.subplots(1, 1, figsize=(12, 10))
+    fig, ax = plt.subplots(1, 1, figsize=(12, 10))
 
     colors = list(mcolors.TABLEAU_COLORS.values())
 
@@ -1859,6 +3499,7 @@ def render_plot(plot: Plot, /, show: bool = True, output: str | None = None):
 
     if show:
         plt.show()
+    plt.close(fig)
 
 
 def si_format(value: float) -> str:
@@ -1886,9 +3527,21 @@ def print_sim_results(sim_results: list[tuple[Simulation, SimulationRunResult |
 
 
 # Subcommand implementations
+#
+# Each subcommand is planned in two phases: the simulations it needs, and how to turn
+# their results into a plot. This lets callers that build many plots (see
+# render_figures.py) share simulations between them.
 
+SimResults = list[tuple[Simulation, SimulationRunResult | None]]
 
-def subcommand_tiers(args: argparse.Namespace) -> Plot:
+
+@dataclasses.dataclass
+class SubcommandPlan:
+    sims: list[Simulation]
+    finish: Callable[[SimResults], Plot]
+
+
+def subcommand_tiers(args: argparse.Namespace) -> SubcommandPlan:
     args.mastery = None
     args.tier = None
     convert_mastery_args(args)
@@ -1898,20 +3551,24 @@ def subcommand_tiers(args: argparse.Namespace) -> Plot:
     baseline_sim_name = sims[0].name
     args.tiers.sort()
     sims.sort(key=lambda sim: sim.name)
-    sim_results = normalize_sims(args, list(evaluate_sims(sims)), baseline_sim_name)
-    if args.print:
-        print_sim_results(sim_results)
-
-    title = ", ".join(
-        [
-            f"Simulating tiers {', '.join(f'T{tier}:W{wave}' for tier, wave in args.tiers)}",
-            *common_args_description(args, baseline_sim_name),
-        ]
-    )
-    return plot_sim_results(args, title, sim_results)
+
+    def finish(sim_results: SimResults) -> Plot:
+        sim_results = normalize_sims(args, sim_results, baseline_sim_name)
+        if args.print:
+            print_sim_results(sim_results)
+
+        title = ", ".join(
+            [
+                f"Simulating tiers {', '.join(f'T{tier}:W{wave}' for tier, wave in args.tiers)}",
+                *common_args_description(args, baseline_sim_name),
+            ]
+        )
+        return plot_sim_results(args, title, sim_results)
+
+    return SubcommandPlan(sims=sims, finish=finish)
 
 
-def subcommand_compare(args: argparse.Namespace) -> Plot:
+def subcommand_compare(args: argparse.Namespace) -> SubcommandPlan:
     args.level = mastery_level(args.level)
     convert_mastery_args(args)
     config = make_sim(args)
@@ -1924,21 +3581,25 @@ def subcommand_compare(args: argparse.Namespace) -> Plot:
         mastery_sim(config, mastery, args.level, args.rerolls_with_cash, args.omit)
         for mastery in MASTERY_DISPLAY_NAMES.keys()
     ]
-    sim_results = normalize_sims(args, list(evaluate_sims(sims)), baseline_sim_name)
-    if args.print:
-        print_sim_results(sim_results)
-
-    title = ", ".join(
-        [
-            f"Comparing masteries at level {args.level}",
-            *common_args_description(args, baseline_sim_name),
-            f"for T{args.tier}W{args.wave}",
-        ]
-    )
-    return plot_sim_results(args, title, sim_results)
 
+    def finish(sim_results: SimResults) -> Plot:
+        sim_results = normalize_sims(args, sim_results, baseline_sim_name)
+        if args.print:
+            print_sim_results(sim_results)
+
+        title = ", ".join(
+            [
+                f"Comparing masteries at level {args.level}",
+                *common_args_description(args, baseline_sim_name),
+                f"for T{args.tier}W{args.wave}",
+            ]
+        )
+        return plot_sim_results(args, title, sim_results)
+
+    return SubcommandPlan(sims=sims, finish=finish)
 
-def subcommand_mastery(args: argparse.Namespace) -> Plot:
+
+def subcommand_mastery(args: argparse.Namespace) -> SubcommandPlan:
     convert_mastery_args(args)
     config = make_sim(args)
     config.max_waves = args.wave
@@ -1948,24 +3609,28 @@ def subcommand_mastery(args: argparse.Namespace) -> Plot:
         for level in MASTERY_LEVELS
     ]
     baseline_sim = sims[0]
-    sim_results = normalize_sims(args, list(evaluate_sims(sims)), baseline_sim.name)
-    if args.print:
-        print_sim_results(sim_results)
-
-    relative_to = (
-        "locked" if baseline_sim.level is None else f"level {baseline_sim.level}"
-    )
-    title = ", ".join(
-        [
-            f"Comparing {MASTERY_DISPLAY_NAMES[args.mastery]}# levels",
-            *common_args_description(args, relative_to),
-            f"for T{args.tier}W{args.wave}",
-        ]
-    )
-    return plot_sim_results(args, title, sim_results)
 
+    def finish(sim_results: SimResults) -> Plot:
+        sim_results = normalize_sims(args, sim_results, baseline_sim.name)
+        if args.print:
+            print_sim_results(sim_results)
+
+        relative_to = (
+            "locked" if baseline_sim.level is None else f"level {baseline_sim.level}"
+        )
+        title = ", ".join(
+            [
+                f"Comparing {MASTERY_DISPLAY_NAMES[args.mastery]}# levels",
+                *common_args_description(args, relative_to),
+                f"for T{args.tier}W{args.wave}",
+            ]
+        )
+        return plot_sim_results(args, title, sim_results)
+
+    return SubcommandPlan(sims=sims, finish=finish)
 
-def subcommand_custom(args: argparse.Namespace) -> Plot:
+
+def subcommand_custom(args: argparse.Namespace) -> SubcommandPlan:
     args.mastery = None
     args.tier = None
     convert_mastery_args(args)
@@ -1975,20 +3640,96 @@ def subcommand_custom(args: argparse.Namespace) -> Plot:
     raise NotImplementedError("Custom simulation is not implemented")
 
     baseline_sim_name = sims[0].name
-    sim_results = normalize_sims(args, list(evaluate_sims(sims)), baseline_sim_name)
-    if args.print:
-        print_sim_results(sim_results)
-
-    title = ", ".join(
-        [
-            f"TODO custom title",
-            *common_args_description(args, baseline_sim_name),
-        ]
+
+    def finish(sim_results: SimResults) -> Plot:
+        sim_results = normalize_sims(args, sim_results, baseline_sim_name)
+        if args.print:
+            print_sim_results(sim_results)
+
+        title = ", ".join(
+            [
+                f"TODO custom title",
+                *common_args_description(args, baseline_sim_name),
+            ]
+        )
+        return plot_sim_results(args, title, sim_results)
+
+    return SubcommandPlan(sims=sims, finish=finish)
+
+
+def sweep_sims(args: argparse.Namespace) -> tuple[list[dict[str, Any]], list[Simulation]]:
+    """
+    Expands the sweep axes into the cartesian product of their values. Returns the axis
+    values of each config, and its sim.
+    """
+    configs = [
+        dict(zip(args.axes.keys(), values)) for values in itertools.product(*args.axes.values())
+    ]
+    sims = []
+    for config in configs:
+        config_args = argparse.Namespace(
+            **{
+                **vars(args),
+                **{SWEEP_AXES[name][0]: value for name, value in config.items()},
+                "reward": args.reward[0],
+            }
+        )
+        convert_mastery_args(config_args)
+        sim = make_sim(config_args)
+        sim.name = " ".join(f"{name}={value}" for name, value in config.items())
+        sim.max_waves = config_args.wave
+        sims.append(sim)
+    return configs, sims
+
+
+def subcommand_sweep(args: argparse.Namespace) -> None:
+    """
+    Simulates every config of the sweep and writes a CSV table with one row per config
+    and reward, to `--output` or stdout.
+    """
+    configs, sims = sweep_sims(args)
+
+    # Configs that only differ by how they are reported (or repeat the same values) are
+    # only simulated once.
+    unique_sims: dict[str, Simulation] = {}
+    for sim in sims:
+        unique_sims.setdefault(result_cache_key(sim, args.engine), sim)
+    unique_results = dict(
+        zip(
+            unique_sims.keys(),
+            (run_result for _, run_result in evaluate_sims(args, list(unique_sims.values()))),
+        )
+    )
+
+    output = (
+        open(args.output, "w", newline="")
+        if args.output is not None
+        else contextlib.nullcontext(sys.stdout)
     )
-    return plot_sim_results(args, title, sim_results)
+    with output as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [*args.axes.keys(), "reward", "waves", "elapsed_time", "total", "per_hour"]
+        )
+        for config, sim in zip(configs, sims):
+            run_result = unique_results[result_cache_key(sim, args.engine)]
+            assert run_result is not None
+            elapsed_time = float(run_result.elapsed_time[-1])
+            for reward in args.reward:
+                total = final_reward_value(dataclasses.replace(sim, reward=reward), run_result)
+                writer.writerow(
+                    [
+                        *config.values(),
+                        reward,
+                        int(run_result.wave[-1]),
+                        elapsed_time,
+                        total,
+                        total / elapsed_time * 3600,
+                    ]
+                )
 
 
-def main():
+def make_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="subcommand")
     subparsers.required = True
@@ -2035,7 +3776,32 @@ def main():
     custom_subparser = subparsers.add_parser("custom")
     add_common_args(custom_subparser)
 
-    args = parser.parse_args()
+    # Tabulate the final rewards of every combination of some options
+    sweep_subparser = subparsers.add_parser("sweep")
+    sweep_subparser.add_argument(
+        "axes",
+        type=sweep_axis_arg,
+        nargs="*",
+        metavar="AXIS=VALUES",
+        help=(
+            "Values of an option to sweep, separated by commas (integer ranges like "
+            f"11..14 are expanded). Axes: {', '.join(SWEEP_AXES)}"
+        ),
+    )
+    sweep_subparser.add_argument(
+        "--spec",
+        default=None,
+        help="JSON file of sweep axes, overridden by axes on the command line",
+    )
+    add_common_args(sweep_subparser)
+
+    return parser
+
+
+def parse_args(
+    parser: argparse.ArgumentParser, argv: list[str] | None = None
+) -> argparse.Namespace:
+    args = parser.parse_args(argv)
 
     if not 0.0 <= args.orb_hits <= 1.0:
         parser.error("--orb-hits must be between 0.0 and 1.0")
@@ -2043,18 +3809,98 @@ def main():
         parser.error("--relative and --difference are mutually exclusive")
     if not args.relative and args.roi:
         parser.error("--roi can only be used with --relative")
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or more")
+    if args.resample is not None and args.resample <= 0.0:
+        parser.error("--resample must be positive")
+
+    # Keep the first occurrence of each reward.
+    args.reward = list(dict.fromkeys(args.reward or ["coins"]))
+
+    if args.subcommand == "sweep":
+        for dest, option in SWEEP_UNSUPPORTED_OPTIONS.items():
+            if getattr(args, dest) not in (None, False):
+                parser.error(f"{option} cannot be used with sweep")
+        axes = {}
+        if args.spec is not None:
+            try:
+                axes.update(read_sweep_spec(args.spec))
+            except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+                parser.error(f"--spec: {e}")
+        axes.update(args.axes)
+        if "wave" not in axes:
+            parser.error("sweep needs a wave axis (e.g. wave=4000)")
+        args.axes = axes
+
+    return args
+
+
+def reward_output(output: str | None, reward: str, rewards: list[str]) -> str | None:
+    # Outputs may contain a "{reward}" placeholder. Otherwise, when plotting several
+    # rewards, the reward is appended to the output's file name.
+    if output is None:
+        return None
+    if "{reward}" in output:
+        return output.replace("{reward}", reward)
+    if len(rewards) == 1:
+        return output
+    root, ext = os.path.splitext(output)
+    return f"{root}-{reward}{ext}"
 
+
+def split_reward_args(args: argparse.Namespace) -> list[argparse.Namespace]:
+    """
+    Split arguments with several rewards into one set of arguments per reward, each
+    with a single `reward` and its own `output`.
+    """
+    return [
+        argparse.Namespace(
+            **{
+                **vars(args),
+                "reward": reward,
+                "output": reward_output(args.output, reward, args.reward),
+            }
+        )
+        for reward in args.reward
+    ]
+
+
+def plan_subcommand(args: argparse.Namespace) -> SubcommandPlan:
     if args.subcommand == "tiers":
-        plot = subcommand_tiers(args)
+        return subcommand_tiers(args)
     elif args.subcommand == "compare":
-        plot = subcommand_compare(args)
+        return subcommand_compare(args)
     elif args.subcommand == "mastery":
-        plot = subcommand_mastery(args)
+        return subcommand_mastery(args)
     elif args.subcommand == "custom":
-        plot = subcommand_custom(args)
-    else:
-        parser.error(f"Invalid subcommand: {args.subcommand}")
-    render_plot(plot, show=args.plot, output=args.output)
+        return subcommand_custom(args)
+    raise ValueError(f"Invalid subcommand: {args.subcommand}")
+
+
+def main():
+    args = parse_args(make_parser())
+    if args.subcommand == "sweep":
+        subcommand_sweep(args)
+        return
+
+    reward_plans = [
+        (reward_args, plan_subcommand(reward_args))
+        for reward_args in split_reward_args(args)
+    ]
+
+    # Plans only differ by reward, and every run computes all rewards, so simulate once.
+    _, first_plan = reward_plans[0]
+    run_results = [run_result for _, run_result in evaluate_sims(args, first_plan.sims)]
+
+    for reward_args, plan in reward_plans:
+        if args.print and len(reward_plans) > 1:
+            print(f"{reward_args.reward}:")
+        sim_results = [
+            (sim, None if run_result is None else with_total(sim, run_result))
+            for sim, run_result in zip(plan.sims, run_results)
+        ]
+        plot = plan.finish(sim_results)
+        render_plot(plot, show=args.plot, output=reward_args.output)
 
 
 if __name__ == "__main__":
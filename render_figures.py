@@ -1,13 +1,25 @@
 #!/usr/bin/env python3
 
 import argparse
+import dataclasses
+import hashlib
+import json
 import os
 import sys
 import shlex
-import subprocess
 from multiprocessing import Pool
 from typing import Iterator
 
+import matplotlib
+
+# Figures are only saved to files, never shown.
+matplotlib.use("Agg")
+
+import mastery_calc
+
+# Arguments that do not change the rendered figure.
+FINGERPRINT_IGNORED_ARGS = ["output", "print", "plot", "jobs", "cache", "cache_dir"]
+
 
 def tiers(
     args: argparse.Namespace,
@@ -34,7 +46,7 @@ def tiers(
     ] + extra_args
 
     output = os.path.join(args.outputdir, "-".join(basename) + ".png")
-    if os.path.exists(output) and not args.clobber:
+    if os.path.exists(output) and not args.clobber and not args.update:
         if args.ignore:
             print(f"{output} already exists, skipping...", file=sys.stderr)
             return None
@@ -79,7 +91,7 @@ def compare(
     ] + extra_args
 
     output = os.path.join(args.outputdir, "-".join(basename) + ".png")
-    if os.path.exists(output) and not args.clobber:
+    if os.path.exists(output) and not args.clobber and not args.update:
         if args.ignore:
             print(f"{output} already exists, skipping...", file=sys.stderr)
             return None
@@ -165,9 +177,160 @@ def generate_commands(args: argparse.Namespace) -> Iterator[list[str]]:
     yield from [cli for cli in commands if cli is not None]
 
 
-def process_command(command: list[str]) -> None:
+def figure_fingerprint(args: argparse.Namespace) -> str:
+    # Everything that affects a rendered figure: its arguments, the game data, and the
+    # simulation and plotting code.
+    figure_args = {
+        name: value
+        for name, value in vars(args).items()
+        if name not in FINGERPRINT_IGNORED_ARGS
+    }
+    fingerprint = json.dumps(
+        {
+            "args": figure_args,
+            "game_data": mastery_calc.game_data_hash(),
+            # Also part of every result cache key, so a figure that is out of date
+            # because the code changed is never rendered from stale cached results.
+            "code": mastery_calc.code_hash(),
+        },
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def fingerprint_path(output: str) -> str:
+    return output + ".fingerprint"
+
+
+def read_fingerprint(output: str) -> str | None:
+    if not os.path.exists(output):
+        return None
+    try:
+        with open(fingerprint_path(output)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+@dataclasses.dataclass
+class Figure:
+    command: list[str]
+    args: argparse.Namespace
+    plan: mastery_calc.SubcommandPlan
+    fingerprint: str
+    # Result cache key of each simulation in `plan.sims`, or None if it is skipped.
+    keys: list[str | None]
+
+
+@dataclasses.dataclass
+class SimTask:
+    sim: mastery_calc.Simulation
+    engine: str
+    cache_dir: str | None
+
+
+def plan_figures(
+    args: argparse.Namespace, commands: Iterator[list[str]]
+) -> list[Figure]:
+    parser = mastery_calc.make_parser()
+    figures = []
+    for command in commands:
+        # Drop the "./mastery_calc.py" program name.
+        command_args = mastery_calc.parse_args(parser, command[1:])
+        for figure_args in mastery_calc.split_reward_args(command_args):
+            # Planning modifies the arguments, so fingerprint them first.
+            fingerprint = figure_fingerprint(figure_args)
+            if args.update and read_fingerprint(figure_args.output) == fingerprint:
+                print(f"{figure_args.output} is up to date, skipping...", file=sys.stderr)
+                continue
+            plan = mastery_calc.plan_subcommand(figure_args)
+            keys = [
+                None if sim.skip else mastery_calc.result_cache_key(sim, figure_args.engine)
+                for sim in plan.sims
+            ]
+            figures.append(
+                Figure(
+                    command=command,
+                    args=figure_args,
+                    plan=plan,
+                    fingerprint=fingerprint,
+                    keys=keys,
+                )
+            )
+    return figures
+
+
+def plan_sim_tasks(figures: list[Figure]) -> dict[str, SimTask]:
+    # Identical simulations are only run once, no matter how many figures use them.
+    # Tasks are ordered by first use, so figures can be finished as early as possible.
+    tasks = {}
+    for figure in figures:
+        for sim, key in zip(figure.plan.sims, figure.keys):
+            if key is not None and key not in tasks:
+                cache_dir = figure.args.cache_dir if figure.args.cache else None
+                tasks[key] = SimTask(sim=sim, engine=figure.args.engine, cache_dir=cache_dir)
+    return tasks
+
+
+def run_sim_task(
+    item: tuple[str, SimTask]
+) -> tuple[str, mastery_calc.SimulationRunResult]:
+    key, task = item
+    return key, mastery_calc.run_cached_sim(task.sim, task.engine, task.cache_dir)
+
+
+def render_figure(
+    command: list[str], plot: mastery_calc.Plot, output: str, fingerprint: str
+) -> None:
     print(shlex.join(command))
-    subprocess.run(command, check=True)
+    mastery_calc.render_plot(plot, show=False, output=output)
+    # Only written once the figure is complete, so an interrupted build is redone.
+    with open(fingerprint_path(output), "w") as f:
+        f.write(fingerprint + "\n")
+
+
+def build_figures(figures: list[Figure], jobs: int | None) -> None:
+    tasks = plan_sim_tasks(figures)
+    # Number of unfinished figures that use each simulation result, so results can be
+    # released as soon as they are no longer needed.
+    users = {key: 0 for key in tasks.keys()}
+    for figure in figures:
+        for key in set(figure.keys) - {None}:
+            users[key] += 1
+
+    results = {}
+    pending = list(figures)
+    with Pool(jobs) as pool:
+        renders = []
+        for key, run_result in pool.imap(run_sim_task, tasks.items()):
+            results[key] = run_result
+
+            ready = [
+                figure for figure in pending
+                if all(sim_key is None or sim_key in results for sim_key in figure.keys)
+            ]
+            for figure in ready:
+                pending.remove(figure)
+                sim_results = [
+                    (sim, None if sim_key is None else mastery_calc.with_total(sim, results[sim_key]))
+                    for sim, sim_key in zip(figure.plan.sims, figure.keys)
+                ]
+                plot = figure.plan.finish(sim_results)
+                renders.append(
+                    pool.apply_async(
+                        render_figure,
+                        (figure.command, plot, figure.args.output, figure.fingerprint),
+                    )
+                )
+                for sim_key in set(figure.keys) - {None}:
+                    users[sim_key] -= 1
+                    if users[sim_key] == 0:
+                        del results[sim_key]
+
+        for render in renders:
+            render.get()
+    assert not pending
 
 
 if __name__ == "__main__":
@@ -176,11 +339,19 @@ if __name__ == "__main__":
     g = parser.add_mutually_exclusive_group()
     g.add_argument("--ignore", action="store_true", default=False)
     g.add_argument("--clobber", action="store_true", default=False)
+    g.add_argument(
+        "--update",
+        action="store_true",
+        default=False,
+        help="Only rebuild figures whose arguments, game data or code changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=0,
+        help="Number of worker processes (0 for one per CPU)",
+    )
     args = parser.parse_args()
 
-    try:
-        pool = Pool()
-        pool.map(process_command, generate_commands(args))
-    finally:
-        pool.close()
-        pool.join()
+    build_figures(plan_figures(args, generate_commands(args)), args.jobs or None)
@@ -0,0 +1,142 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+import mastery_calc
+
+BASE_SIM = mastery_calc.Simulation(
+    tier=11,
+    max_waves=500,
+    free_upgrade_chances={"attack": 0.75, "defense": 0.75, "utility": 0.75},
+)
+
+# Changes to `BASE_SIM` that exercise different parts of the engines.
+ENGINE_CONFIGS = {
+    "base": {},
+    "intro sprint": {"intro_sprint": 6},
+    "wave skip": {"wave_skip": 5},
+    "wave accelerator": {"wave_accelerator": 5},
+    "golden combo with bhd": {"golden_combo": 0.003, "bhd_bonus": 0.05},
+    "enemy balance": {"enemy_balance": 5},
+    "cash and recovery package": {"cash": 5, "recovery_package": 5},
+    "tier 1": {"tier": 1},
+    "sampled": {"sample": "log:20"},
+    "streamed": {"sample": "stream:50"},
+}
+
+# Groups of sims that only differ by scenario parameters, so each compiles into a
+# single scenario matrix.
+SCENARIO_GROUPS = {
+    "orb hits": [{"orb_hits": 0.5}, {"orb_hits": 1.0}],
+    "orb hits with extra orb": [
+        {"orb_hits": 0.5, "extra_orb": 5},
+        {"orb_hits": 1.0, "extra_orb": 5},
+    ],
+    "bhd": [{"bhd_bonus": 0.0}, {"bhd_bonus": 0.05}, {"bhd_bonus": 0.1}],
+    "golden combo": [{"golden_combo": 0.0015}, {"golden_combo": 0.003}],
+    "package chance with recovery package": [
+        {"package_chance": 0.2, "recovery_package": 3},
+        {"package_chance": 0.6, "recovery_package": 3},
+    ],
+    "bhd with recovery package": [
+        {"bhd_bonus": 0.0, "recovery_package": 3},
+        {"bhd_bonus": 0.05, "recovery_package": 3},
+    ],
+    "free upgrade chances with critical coin": [
+        {"free_upgrade_chances": {"attack": 0.5, "defense": 0.75}, "critical_coin": 4},
+        {"free_upgrade_chances": {"attack": 0.9, "defense": 0.6}, "critical_coin": 4},
+    ],
+    "sampled": [
+        {"orb_hits": 0.5, "bhd_bonus": 0.03, "sample": "log:20"},
+        {"orb_hits": 1.0, "bhd_bonus": 0.0, "sample": "log:20"},
+    ],
+    "streamed": [
+        {"package_chance": 0.2, "sample": "stream:50"},
+        {"package_chance": 0.6, "sample": "stream:50"},
+    ],
+}
+
+
+def assert_runs_close(lhs, rhs, rtol):
+    lhs_columns = mastery_calc.run_result_columns(lhs)
+    rhs_columns = mastery_calc.run_result_columns(rhs)
+    assert lhs_columns.keys() == rhs_columns.keys()
+    for name, column in lhs_columns.items():
+        np.testing.assert_allclose(column, rhs_columns[name], rtol=rtol, err_msg=name)
+
+
+@pytest.mark.parametrize("changes", ENGINE_CONFIGS.values(), ids=ENGINE_CONFIGS.keys())
+def test_vector_engine_matches_loop_engine(changes):
+    sim = dataclasses.replace(BASE_SIM, **changes)
+    vector_result = mastery_calc.run_sim(sim, "vector")
+    assert_runs_close(vector_result, mastery_calc.run_sim(sim, "loop"), rtol=1e-9)
+
+
+@pytest.mark.parametrize("group", SCENARIO_GROUPS.values(), ids=SCENARIO_GROUPS.keys())
+def test_scenario_matrix_matches_single_runs(group):
+    sims = [dataclasses.replace(BASE_SIM, **changes) for changes in group]
+    matrices = mastery_calc.compile_scenarios(sims)
+    assert [matrix.indices for matrix in matrices] == [list(range(len(sims)))]
+
+    run_results = mastery_calc.run_scenario_matrix(matrices[0])
+    for sim, run_result in zip(sims, run_results):
+        assert_runs_close(run_result, mastery_calc.run_sim(sim, "vector"), rtol=1e-12)
+        assert_runs_close(run_result, mastery_calc.run_sim(sim, "loop"), rtol=1e-9)
+
+
+def test_scenario_matrix_chunks():
+    sims = [dataclasses.replace(BASE_SIM, orb_hits=orb_hits) for orb_hits in (0.2, 0.4, 0.6)]
+    (matrix,) = mastery_calc.compile_scenarios(sims)
+    # One scenario per chunk.
+    chunked = mastery_calc.run_scenario_matrix(matrix, max_bytes=1)
+    for run_result, chunked_result in zip(mastery_calc.run_scenario_matrix(matrix), chunked):
+        assert_runs_close(run_result, chunked_result, rtol=0)
+
+
+@pytest.mark.parametrize("engine", ["loop", "vector"])
+def test_cached_runs_match_fresh_runs(engine, tmp_path):
+    cache_dir = str(tmp_path)
+
+    def run(max_waves):
+        sim = dataclasses.replace(BASE_SIM, max_waves=max_waves)
+        cached_result = mastery_calc.run_cached_sim(sim, engine, cache_dir)
+        assert_runs_close(cached_result, mastery_calc.run_sim(sim, engine), rtol=1e-12)
+
+    run(300)
+    # Read back from the cache.
+    run(300)
+    # Extended from the 300 wave run.
+    run(500)
+    # Sliced from the 500 wave run.
+    run(400)
+
+
+@pytest.mark.parametrize(
+    "field, changes",
+    [
+        ("coin", {}),
+        ("cash", {}),
+        ("enemy_balance", {}),
+        ("wave_accelerator", {}),
+        ("coin", {"intro_sprint": 4}),
+        ("extra_orb", {"sample": "log:20"}),
+    ],
+)
+def test_forked_runs_match_runs_from_wave_0(field, changes):
+    base_sim = dataclasses.replace(BASE_SIM, **changes)
+    sims = [dataclasses.replace(base_sim, **{field: level}) for level in (None, 3, 9)]
+    prefixes = mastery_calc.run_prefixes(sims, "loop")
+    assert all(prefix is not None for prefix in prefixes)
+    for sim, prefix in zip(sims, prefixes):
+        forked_result = mastery_calc.run_cached_sim(sim, "loop", prefix=prefix)
+        assert_runs_close(forked_result, mastery_calc.run_sim(sim, "loop"), rtol=0)
+
+
+@pytest.mark.parametrize("field", mastery_calc.AFFINE_MASTERY_EFFECTS.keys())
+def test_level_batch_matches_single_runs(field):
+    sims = [dataclasses.replace(BASE_SIM, **{field: level}) for level in (None, 0, 4, 9)]
+    assert mastery_calc.plan_level_batches(sims, "vector") == [(field, [0, 1, 2, 3])]
+    run_results = mastery_calc.run_level_batch(sims, field, "vector")
+    for sim, run_result in zip(sims, run_results):
+        assert_runs_close(run_result, mastery_calc.run_sim(sim, "vector"), rtol=1e-9)